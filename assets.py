@@ -0,0 +1,348 @@
+# ----------------------------------------------------------------------------#
+# Static asset pipeline.
+#
+# 'flask assets build' writes static/dist/: the BUNDLES (the stylesheets
+# and scripts of every page, concatenated and minified), plus every other
+# static file, each named after a hash of its content, with .gz and .br
+# (brotli package) copies of the text files and a manifest.json.
+#
+# With a manifest, url_for('static', filename=...) points at the hashed
+# copy and the static route serves the smallest encoding the client takes,
+# cached for a year: a new build changes the names instead of expiring
+# anything. Without one, or with ASSETS_DEBUG, the source files are served
+# one by one, so there is nothing to rebuild while developing.
+#
+# A build leaves the files of the ASSETS_KEEP builds before it in place,
+# for the workers still running the old manifest and the pages cached
+# with its URLs, and deletes the older ones.
+# ----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import request, send_from_directory, url_for
+
+# bundle name -> source files, in page order
+BUNDLES = {
+    'bundle/site.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    # loaded in <head>, before the page's inline scripts
+    'bundle/head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+        'js/script.js',
+    ],
+    # deferred, after jQuery
+    'bundle/site.js': [
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+        'js/autocomplete.js',
+        'js/lookup.js',
+    ],
+}
+
+OUTPUT = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.eot', '.otf', '.ttf'}
+# (encoding, suffix), best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_STRING = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+SOURCE_MAP = re.compile(r'^\s*//[#@] sourceMappingURL=.*$', re.M)
+# after these, a / starts a regular expression rather than a division
+REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^') | {''}
+
+
+def minify_css(text):
+    """Drop comments and the whitespace CSS does not need, strings untouched."""
+    strings = []
+
+    def keep(match):
+        strings.append(match.group(0))
+        return '\0{}\0'.format(len(strings) - 1)
+
+    text = CSS_STRING.sub(keep, CSS_COMMENT.sub('', text))
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    # before a colon only in declarations: in a selector, "a :hover" is not "a:hover"
+    text = re.sub(r'\s+:(?=[^{}]*[;}])', ':', text)
+    text = re.sub(r':\s+', ':', text)
+    text = text.replace(';}', '}').strip()
+    return re.sub('\0(\\d+)\0', lambda match: strings[int(match.group(1))], text)
+
+
+def minify_js(text):
+    """Drop comments, indentation and blank lines.
+
+    Line breaks stay, so automatic semicolon insertion sees the code it
+    saw before; strings, template literals and regular expressions are
+    copied as they are.
+    """
+    out = []
+    i, n = 0, len(text)
+    last = ''
+    while i < n:
+        char = text[i]
+        if char in '\'"`':
+            end = i + 1
+            while end < n and text[end] != char:
+                end += 2 if text[end] == '\\' else 1
+            out.append(text[i:end + 1])
+            last, i = char, end + 1
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end < 0 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            out.append(' ')
+        elif char == '/' and (last in REGEX_AFTER or re.search(r'\b(return|typeof|case|in|of)\s*$',
+                                                                   ''.join(out[-12:]))):
+            end, in_class = i + 1, False
+            while end < n and (text[end] != '/' or in_class) and text[end] != '\n':
+                if text[end] == '\\':
+                    end += 1
+                elif text[end] in '[]':
+                    in_class = text[end] == '['
+                end += 1
+            out.append(text[i:end + 1])
+            last, i = '/', end + 1
+        else:
+            out.append(char)
+            if not char.isspace():
+                last = char
+            i += 1
+    lines = (line.strip() for line in ''.join(out).splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def minify(path, text):
+    if '.min.' in path:
+        return text
+    if path.endswith('.css'):
+        return minify_css(text)
+    if path.endswith('.js'):
+        return minify_js(text)
+    return text
+
+
+def hashed_name(path, content):
+    root, ext = posixpath.splitext(path)
+    return '{}.{}{}'.format(root, hashlib.sha256(content).hexdigest()[:12], ext)
+
+
+def compress(path, content, level=9):
+    """Write the .br and .gz copies of a file that shrink it; returns their encodings."""
+    if posixpath.splitext(path)[1] not in COMPRESSIBLE:
+        return []
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    encoded = {'gzip': gzip.compress(content, compresslevel=level, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(content, quality=11)
+    encodings = []
+    for encoding, suffix in ENCODINGS:
+        data = encoded.get(encoding)
+        if data is not None and len(data) < len(content) * 0.9:
+            with open(path + suffix, 'wb') as f:
+                f.write(data)
+            encodings.append(encoding)
+    return encodings
+
+
+class Builder(object):
+    """Writes the fingerprinted, minified and precompressed copies of a static folder."""
+
+    def __init__(self, static_folder, bundles=None, gzip_level=9, keep=2):
+        self.static_folder = static_folder
+        self.output = os.path.join(static_folder, OUTPUT)
+        self.bundles = BUNDLES if bundles is None else bundles
+        self.gzip_level = gzip_level
+        self.keep = keep
+        self.files = {}
+        self.encodings = {}
+
+    def sources(self):
+        for root, dirs, names in os.walk(self.static_folder):
+            dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != self.output)
+            for name in sorted(name for name in names if not name.startswith('.')):
+                yield posixpath.relpath(os.path.join(root, name).replace(os.sep, '/'),
+                                        self.static_folder.replace(os.sep, '/'))
+
+    def read(self, path):
+        with open(os.path.join(self.static_folder, path), 'rb') as f:
+            return f.read()
+
+    def rewrite_urls(self, source, target, text):
+        """Point the url()s of a stylesheet moved from source to target at the right files."""
+        def replace(match):
+            ref = match.group(2).strip()
+            if re.match(r'^([a-z]+:|/|#)', ref):
+                return match.group(0)
+            ref, _, suffix = ref.partition('?')
+            ref, _, fragment = ref.partition('#')
+            path = posixpath.normpath(posixpath.join(posixpath.dirname(source), ref))
+            # already built files are referred to by their hashed copy, the rest stays in static/
+            path = posixpath.join(OUTPUT, self.files[path]) if path in self.files else path
+            url = posixpath.relpath(path, posixpath.dirname(posixpath.join(OUTPUT, target)))
+            if suffix:
+                url += '?' + suffix
+            if fragment:
+                url += '#' + fragment
+            return 'url("{}")'.format(url)
+        return CSS_URL.sub(replace, text)
+
+    def write(self, name, content):
+        target = hashed_name(name, content)
+        path = os.path.join(self.output, *target.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        self.files[name] = target
+        encodings = compress(path, content, self.gzip_level)
+        if encodings:
+            self.encodings[target] = encodings
+        return target
+
+    def text(self, path, target):
+        text = SOURCE_MAP.sub('', self.read(path).decode('utf-8'))
+        text = minify(path, text)
+        if path.endswith('.css'):
+            text = self.rewrite_urls(path, target, text)
+        return text
+
+    def previous(self):
+        """The hashed files of the builds to keep and their encodings, from the last manifest."""
+        try:
+            with open(os.path.join(self.output, MANIFEST)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return [], {}
+        generations = manifest.get('generations', [sorted(manifest['files'].values())])
+        return generations[:self.keep], manifest['encodings']
+
+    def prune(self, generations):
+        """Delete the files of static/dist/ no kept build refers to."""
+        kept = {MANIFEST}
+        for target in (target for generation in generations for target in generation):
+            kept.add(target)
+            kept.update(target + suffix for _, suffix in ENCODINGS)
+        for root, dirs, names in os.walk(self.output):
+            for name in names:
+                path = os.path.join(root, name)
+                if posixpath.relpath(path.replace(os.sep, '/'), self.output.replace(os.sep, '/')) not in kept:
+                    os.remove(path)
+
+    def build(self):
+        previous, encodings = self.previous()
+        os.makedirs(self.output, exist_ok=True)
+
+        # stylesheets last, so the fonts and images they use already have their hashed names
+        sources = sorted(self.sources(), key=lambda path: path.endswith('.css'))
+        for path in sources:
+            if path.endswith(('.css', '.js')):
+                self.write(path, self.text(path, path).encode('utf-8'))
+            else:
+                self.write(path, self.read(path))
+
+        for name, paths in self.bundles.items():
+            separator = '\n' if name.endswith('.css') else ';\n'
+            content = separator.join(self.text(path, name) for path in paths)
+            self.write(name, content.encode('utf-8'))
+
+        # newest first, this build's files in the first one
+        generations = [sorted(set(self.files.values()))] + previous
+        kept = {target for generation in generations for target in generation}
+        self.encodings.update({target: encoding for target, encoding in encodings.items()
+                               if target in kept and target not in self.encodings})
+        self.prune(generations)
+        with open(os.path.join(self.output, MANIFEST), 'w') as f:
+            json.dump({'files': self.files, 'encodings': self.encodings, 'generations': generations},
+                      f, indent=2, sort_keys=True)
+        return self.files
+
+
+class Assets(object):
+    """url_for() and static route support for the files of 'flask assets build'."""
+
+    def __init__(self, app=None):
+        self.files = {}
+        self.encodings = {}
+        self.hashed = set()
+        self.max_age = 365 * 24 * 3600
+        self.static_folder = None
+        self.send_static_file = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_DEBUG', False)
+        app.config.setdefault('ASSETS_MAX_AGE', self.max_age)
+        self.max_age = app.config['ASSETS_MAX_AGE']
+        self.static_folder = app.static_folder
+        if not app.config['ASSETS_DEBUG']:
+            self.load(os.path.join(app.static_folder, OUTPUT, MANIFEST))
+
+        self.send_static_file = app.view_functions['static']
+        app.view_functions['static'] = self.serve
+        app.url_defaults(self.fingerprint)
+        app.add_template_global(self.asset_urls)
+        app.extensions['assets'] = self
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        self.files = manifest['files']
+        self.encodings = manifest['encodings']
+        # the files of the kept builds too, for the pages that still link them
+        generations = manifest.get('generations', [self.files.values()])
+        self.hashed = {OUTPUT + '/' + target for generation in generations for target in generation}
+
+    def fingerprint(self, endpoint, values):
+        if endpoint == 'static' and values.get('filename') in self.files:
+            values['filename'] = OUTPUT + '/' + self.files[values['filename']]
+
+    def asset_urls(self, name):
+        """The URLs of a bundle: the built file, or its sources one by one."""
+        if name in self.files or name not in BUNDLES:
+            return [url_for('static', filename=name)]
+        return [url_for('static', filename=path) for path in BUNDLES[name]]
+
+    def serve(self, filename):
+        if not self.files or filename not in self.hashed:
+            return self.send_static_file(filename=filename)
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        accepted = request.accept_encodings
+        directory = os.path.join(self.static_folder, OUTPUT)
+        name = filename[len(OUTPUT) + 1:]
+        for encoding, suffix in ENCODINGS:
+            if encoding in self.encodings.get(name, ()) and accepted[encoding]:
+                response = send_from_directory(directory, name + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(directory, name, mimetype=mimetype)
+        if name in self.encodings:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        response.cache_control.immutable = True
+        return response
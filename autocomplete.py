@@ -0,0 +1,239 @@
+# ----------------------------------------------------------------------------#
+# Type-ahead for the venue and artist search boxes.
+#
+# Each worker keeps a prefix index per kind: a sorted array of the words of
+# the names, cities and states, with the id each word belongs to. A query
+# is one bisect per word; the matches are ranked by popularity (number of
+# shows), then name, and the top ones for one- and two-letter prefixes
+# are memoized until the next change.
+#
+# The index is built in a background thread on the first request of a
+# worker and rebuilt every AUTOCOMPLETE_REFRESH seconds, which also picks
+# up the writes of the other workers. Until it is ready, queries go to the
+# database through search.search(). The write handlers keep it exact in
+# between with put(), remove() and bump().
+# ----------------------------------------------------------------------------#
+
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+import search
+
+logger = logging.getLogger('fyyur.autocomplete')
+
+WORD = re.compile(r'\w+')
+# prefixes this short match too much to rank on every keystroke
+MEMO_LENGTH = 2
+MAX_LIMIT = 50
+# seconds before building again after a failed build
+RETRY = 30
+
+
+def normalize(text):
+    """Lower case without accents: 'Café' and 'cafe' are the same word."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def words(*texts):
+    return sorted({word for text in texts for word in WORD.findall(normalize(text))})
+
+
+class PrefixIndex(object):
+    """Words sorted in one array, with the ids they belong to in a parallel one."""
+
+    def __init__(self):
+        self.keys = []
+        self.ids = array('l')
+        # id -> [name, city, state, popularity, words]
+        self.entries = {}
+        self.memo = {}
+
+    def load(self, rows):
+        """Build from (id, name, city, state, popularity) rows, much faster than put()s."""
+        pairs = []
+        for id, name, city, state, popularity in rows:
+            entry = [name, city, state, popularity or 0, words(name, city, state)]
+            self.entries[id] = entry
+            pairs.extend((word, id) for word in entry[4])
+        pairs.sort()
+        self.keys = [word for word, _ in pairs]
+        self.ids = array('l', (id for _, id in pairs))
+        self.memo.clear()
+
+    def put(self, id, name, city, state):
+        old = self.entries.get(id)
+        popularity = old[3] if old else 0
+        self.remove(id)
+        entry = self.entries[id] = [name, city, state, popularity, words(name, city, state)]
+        for word in entry[4]:
+            position = bisect_left(self.keys, word)
+            self.keys.insert(position, word)
+            self.ids.insert(position, id)
+        self.memo.clear()
+
+    def remove(self, id):
+        entry = self.entries.pop(id, None)
+        if entry is None:
+            return
+        for word in entry[4]:
+            position = bisect_left(self.keys, word)
+            while self.keys[position] == word and self.ids[position] != id:
+                position += 1
+            del self.keys[position]
+            del self.ids[position]
+        self.memo.clear()
+
+    def bump(self, id, count):
+        entry = self.entries.get(id)
+        if entry is not None:
+            entry[3] = max(0, entry[3] + count)
+            self.memo.clear()
+
+    def _matching(self, prefix):
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\uffff', start)
+        return set(self.ids[start:end])
+
+    def _rank(self, ids, limit):
+        entries = self.entries
+        return heapq.nsmallest(limit, ids, key=lambda id: (-entries[id][3], entries[id][0], id))
+
+    def lookup(self, query, limit):
+        """The ids of the top ``limit`` entries having a word starting with each word of the query."""
+        prefixes = WORD.findall(normalize(query))
+        if not prefixes:
+            return []
+        if len(prefixes) == 1 and len(prefixes[0]) <= MEMO_LENGTH:
+            top = self.memo.get(prefixes[0])
+            if top is None:
+                top = self.memo[prefixes[0]] = self._rank(self._matching(prefixes[0]), MAX_LIMIT)
+            return top[:limit]
+
+        # the longest prefix has the fewest matches, the others filter those
+        prefixes.sort(key=len, reverse=True)
+        candidates = self._matching(prefixes[0])
+        for prefix in prefixes[1:]:
+            candidates = {id for id in candidates
+                          if any(word.startswith(prefix) for word in self.entries[id][4])}
+        return self._rank(candidates, limit)
+
+    def entry(self, id):
+        name, city, state, popularity, _ = self.entries[id]
+        return {'id': id, 'name': name, 'city': city, 'state': state, 'shows': popularity}
+
+
+class Autocomplete(object):
+    """The prefix indexes of the venues and artists of a worker."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.models = {}
+        self.indexes = None
+        self.refresh = 300
+        self.built_at = 0.0
+        self.started_at = 0.0
+        self._lock = threading.Lock()
+        self._building = False
+        self._pending = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from models import Venue, Artist
+        self.app = app
+        self.models = {'venue': Venue, 'artist': Artist}
+        self.refresh = app.config.get('AUTOCOMPLETE_REFRESH', 300)
+        app.before_first_request(self.start)
+        app.extensions['autocomplete'] = self
+
+    @property
+    def ready(self):
+        return self.indexes is not None
+
+    def start(self):
+        """Build the indexes in the background, unless that is already under way."""
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+            self.started_at = time.time()
+        threading.Thread(target=self.build, name='autocomplete-build', daemon=True).start()
+
+    def build(self):
+        from extensions import db
+        try:
+            with self.app.app_context():
+                try:
+                    indexes = {}
+                    for kind, model in self.models.items():
+                        # popularity: the show counters kept by counters.py
+                        rows = db.session.query(model.id, model.name, model.city, model.state,
+                                                model.upcoming_shows_count + model.past_shows_count)
+                        index = indexes[kind] = PrefixIndex()
+                        index.load(rows)
+                finally:
+                    db.session.remove()
+        except Exception:
+            logger.exception('Could not build the autocomplete index, answering from the database.')
+            with self._lock:
+                self._building = False
+            return
+
+        with self._lock:
+            # the writes made while it was being built
+            for kind, method, args in self._pending:
+                getattr(indexes[kind], method)(*args)
+            self._pending = []
+            self.indexes = indexes
+            self.built_at = time.time()
+            self._building = False
+        logger.info('Autocomplete index built: %s.', ', '.join(
+            '{} {}s'.format(len(index.entries), kind) for kind, index in indexes.items()))
+
+    def _apply(self, kind, method, *args):
+        with self._lock:
+            if self._building:
+                self._pending.append((kind, method, args))
+            if self.indexes is not None:
+                getattr(self.indexes[kind], method)(*args)
+
+    def put(self, kind, id, name, city, state):
+        """A venue or artist was created or renamed."""
+        self._apply(kind, 'put', id, name, city, state)
+
+    def remove(self, kind, id):
+        self._apply(kind, 'remove', id)
+
+    def bump(self, kind, id, count=1):
+        """``count`` shows were added to (or, negative, removed from) a venue or artist."""
+        self._apply(kind, 'bump', id, count)
+
+    def lookup(self, kind, query, limit=10):
+        """(source, entries): 'index', or 'sql' while the index is not built yet."""
+        limit = max(1, min(limit, MAX_LIMIT))
+        now = time.time()
+        if self.ready:
+            if self.refresh and now - self.built_at > self.refresh:
+                self.start()
+        elif now - self.started_at > RETRY:
+            self.start()
+        if self.ready:
+            with self._lock:
+                index = self.indexes[kind]
+                return 'index', [index.entry(id) for id in index.lookup(query, limit)]
+        return 'sql', self._sql(kind, query, limit)
+
+    def _sql(self, kind, query, limit):
+        from extensions import db
+        model = self.models[kind]
+        rows, _ = search.search(db.session, model, query, per_page=limit, max_results=limit,
+                                backend=self.app.config.get('SEARCH_BACKEND'))
+        return [{'id': row.id, 'name': row.name, 'city': row.city, 'state': row.state, 'shows': None}
+                for row in rows]
@@ -0,0 +1,81 @@
+"""Fire parallel bookings for the same slot and check only one of them lands.
+
+Usage:
+    DATABASE_URL=sqlite:///race.db python benchmarks/booking_race.py --workers 16
+
+The script adds its own artists and venues, so the database should be a
+scratch one. It exits with status 1 if a double booking got through.
+"""
+import argparse
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Artist, Venue, Shows  # noqa: E402
+
+app = create_app({'WTF_CSRF_ENABLED': False})
+
+
+def fire(workers, payloads):
+    barrier = threading.Barrier(workers)
+
+    def book(payload):
+        client = app.test_client()
+        barrier.wait()
+        client.post('/shows/create', data=payload)
+
+    threads = [threading.Thread(target=book, args=(payloads[i % len(payloads)],))
+               for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        artists = [Artist(name='Race artist {}'.format(i)) for i in range(args.workers)]
+        venues = [Venue(name='Race venue {}'.format(i)) for i in range(args.workers)]
+        db.session.add_all(artists + venues)
+        db.session.commit()
+        artist_ids = [artist.id for artist in artists]
+        venue_ids = [venue.id for venue in venues]
+        db.session.remove()
+
+    start = datetime.now().replace(microsecond=0) + timedelta(days=365)
+    # one artist at many venues, then many artists at one venue, each
+    # request a few minutes apart so every pair overlaps
+    scenarios = {
+        'artist': [{'artist_id': artist_ids[0], 'venue_id': venue_id,
+                    'start_time': str(start + timedelta(minutes=i))}
+                   for i, venue_id in enumerate(venue_ids)],
+        'venue': [{'artist_id': artist_id, 'venue_id': venue_ids[0],
+                   'start_time': str(start + timedelta(days=1, minutes=i))}
+                  for i, artist_id in enumerate(artist_ids)],
+    }
+
+    failed = False
+    for name, payloads in scenarios.items():
+        fire(args.workers, payloads)
+        with app.app_context():
+            key = Shows.artist_id if name == 'artist' else Shows.venue_id
+            booked = Shows.query.filter(key == payloads[0][name + '_id']).count()
+        print('{} double booking: {} parallel requests, {} show(s) stored'
+              .format(name, args.workers, booked))
+        failed = failed or booked > 1
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
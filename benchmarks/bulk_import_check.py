@@ -0,0 +1,79 @@
+"""Check that imported venues and artists with empty cells render their pages.
+
+Usage:
+    python benchmarks/bulk_import_check.py [--dir /tmp/fyyur-import]
+
+Writes CSV files with an empty genres cell (and empty non-text cells),
+loads them with 'flask data import' into a scratch SQLite database and
+fetches the detail pages. The script exits with status 1 if a cell came
+back with the wrong value or a page did not render.
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Venue, Artist  # noqa: E402
+
+ROWS = {
+    'venues': {'id': '1', 'name': 'Empty genres venue', 'city': 'Austin', 'state': 'TX',
+               'genres': '', 'seeking_talent': '', 'listed_on': ''},
+    'artists': {'id': '1', 'name': 'Empty genres artist', 'city': 'Austin', 'state': 'TX',
+                'genres': '', 'seeking_venue': '', 'listed_on': ''},
+}
+
+
+def write_csv(path, row):
+    with open(path, 'w', newline='', encoding='utf-8') as stream:
+        writer = csv.DictWriter(stream, fieldnames=list(row))
+        writer.writeheader()
+        writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', default=tempfile.mkdtemp(prefix='fyyur-import-'))
+    args = parser.parse_args()
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(args.dir, 'import.db'),
+        'CACHE_TYPE': 'null',
+    })
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+    checks = []
+    runner = app.test_cli_runner()
+    for entity, row in ROWS.items():
+        path = os.path.join(args.dir, entity + '.csv')
+        write_csv(path, row)
+        result = runner.invoke(args=['data', 'import', entity, path])
+        checks.append(('flask data import ' + entity, result.exit_code, 0))
+
+    with app.app_context():
+        for model, flag in ((Venue, 'seeking_talent'), (Artist, 'seeking_venue')):
+            stored = model.query.get(1)
+            checks.append(('{}.genres'.format(model.__tablename__), stored.genres, ''))
+            checks.append(('{}.{}'.format(model.__tablename__, flag), getattr(stored, flag), None))
+            checks.append(('{}.listed_on'.format(model.__tablename__), stored.listed_on, None))
+        db.session.remove()
+
+    client = app.test_client()
+    for path in ('/venues/1', '/artists/1'):
+        checks.append(('GET ' + path, client.get(path).status_code, 200))
+
+    failed = False
+    for name, got, expected in checks:
+        print('{:<40} {!r:<8} {}'.format(name, got, 'ok' if got == expected else 'expected {!r}'.format(expected)))
+        failed = failed or got != expected
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""CPU time against bytes saved for the response compression levels.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python benchmarks/compress_bench.py [--paths /shows /venues]
+
+The pages are fetched once, uncompressed, through the test client; each
+is then compressed at every gzip level and a range of brotli qualities,
+in one go and (for the streamed export) chunk by chunk with a flush after
+every chunk, as the middleware does. Fill the database with
+benchmarks/generate.py first so the pages have a realistic size.
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app  # noqa: E402
+from compress import GzipStream, BrotliStream, brotli_available  # noqa: E402
+
+BROTLI_LEVELS = (0, 1, 2, 4, 5, 6, 9, 11)
+
+
+def fetch(client, path):
+    response = client.get(path, headers={'Accept-Encoding': 'identity'})
+    chunks = [chunk for chunk in response.response if chunk]
+    response.close()
+    return [chunk.encode() if isinstance(chunk, str) else chunk for chunk in chunks]
+
+
+def run(make, chunks, streamed, repeat):
+    """Median seconds and compressed size."""
+    timings = []
+    for _ in range(repeat):
+        stream = make()
+        started = time.perf_counter()
+        if streamed:
+            size = sum(len(stream.compress(chunk) + stream.flush()) for chunk in chunks)
+        else:
+            size = len(stream.compress(b''.join(chunks)))
+        size += len(stream.finish())
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2], size
+
+
+def codecs(args):
+    for level in range(1, 10):
+        yield 'gzip', level, lambda level=level: GzipStream(level)
+    if brotli_available() and not args.gzip_only:
+        for level in BROTLI_LEVELS:
+            yield 'br', level, lambda level=level: BrotliStream(level)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--paths', nargs='+', default=['/shows', '/venues', '/artists', '/export/shows.csv'])
+    parser.add_argument('--repeat', type=int, default=9)
+    parser.add_argument('--gzip-only', action='store_true')
+    args = parser.parse_args()
+
+    app = create_app({'CACHE_TYPE': 'null', 'SQL_NPLUS1_RAISE': False})
+    client = app.test_client(use_cookies=False)
+    if not brotli_available():
+        print('brotli is not installed, gzip only (pip install brotli).')
+
+    for path in args.paths:
+        chunks = fetch(client, path)
+        total = sum(len(chunk) for chunk in chunks)
+        # the exports are generators: compressed chunk by chunk by the middleware
+        streamed = len(chunks) > 1
+        print('\n{}: {:.1f} KiB in {} chunk(s){}'.format(path, total / 1024, len(chunks),
+                                                         ', streamed' if streamed else ''))
+        print('{:<10} {:>9} {:>8} {:>10} {:>9}'.format('codec', 'size KiB', 'ratio', 'time ms', 'MB/s'))
+        for name, level, make in codecs(args):
+            seconds, size = run(make, chunks, streamed, args.repeat)
+            print('{:<10} {:>9.1f} {:>7.1f}x {:>10.3f} {:>9.1f}'.format(
+                '{} {}'.format(name, level), size / 1024, total / size, seconds * 1000,
+                total / seconds / 1e6 if seconds else 0.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Micro-benchmark of the datetime template filter.
+
+Usage:
+    python benchmarks/datetime_bench.py --rows 5000
+
+Compares the babel.dates.format_datetime based filter the app used to
+have with the precompiled format_datetime and the format_datetimes batch.
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import babel.dates  # noqa: E402
+import dateutil.parser  # noqa: E402
+
+from filters import DATETIME_FORMATS, format_datetime, format_datetimes  # noqa: E402
+
+
+def previous_format_datetime(value, format='medium'):
+    if isinstance(value, str):
+        date = dateutil.parser.parse(value)
+    else:
+        date = value
+    return babel.dates.format_datetime(date, DATETIME_FORMATS.get(format, format), locale='en')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    start = datetime(2021, 1, 1, 20, 0)
+    column = [start + timedelta(hours=7 * i) for i in range(args.rows)]
+    assert [previous_format_datetime(value, 'full') for value in column] == \
+        [format_datetime(value, 'full') for value in column] == format_datetimes(column, 'full')
+
+    cases = [
+        ('previous filter', lambda: [previous_format_datetime(value, 'full') for value in column]),
+        ('format_datetime', lambda: [format_datetime(value, 'full') for value in column]),
+        ('format_datetimes', lambda: format_datetimes(column, 'full')),
+    ]
+    print('{} timestamps, best of {}'.format(args.rows, args.repeat))
+    for name, run in cases:
+        best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        print('{:<18} {:8.2f} ms  {:6.2f} us/row'.format(name, best * 1000, best * 1e6 / args.rows))
+
+
+if __name__ == '__main__':
+    main()
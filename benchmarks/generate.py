@@ -0,0 +1,190 @@
+"""Fill a database with a synthetic catalogue of venues, artists, albums and shows.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python benchmarks/generate.py --shows 100k --drop
+
+--shows takes 1k, 100k, 1M or any number; the other tables are sized from
+it (a venue hosts about 50 shows, an artist plays about 25). The same
+--seed always gives the same rows. --drop recreates every table first,
+so only point it at a scratch database.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as clock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bulk  # noqa: E402
+import counters  # noqa: E402
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Genre, VenueGenres, ArtistGenres, Venue, Artist, Shows, Album, Songs  # noqa: E402
+
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+WORDS = ['Blue', 'Note', 'Jazz', 'Hall', 'Park', 'Cellar', 'Lounge', 'Room', 'House', 'Club',
+         'Garden', 'Theatre', 'Dome', 'Arena', 'Underground', 'Tavern', 'Loft', 'Basement']
+FIRST = ['Guns', 'Matt', 'The Wild', 'Silver', 'Lucky', 'Velvet', 'Electric', 'Midnight',
+         'Golden', 'Little', 'Big', 'Crimson', 'Northern', 'Lonely', 'Happy', 'Neon']
+LAST = ['Roses', 'Quevedo', 'Sax Band', 'Owls', 'Hearts', 'Riders', 'Echoes', 'Brothers',
+        'Sisters', 'Trio', 'Collective', 'Orchestra', 'Kids', 'Machines', 'Ghosts', 'Wolves']
+CITIES = [('New York', 'NY'), ('San Francisco', 'CA'), ('Austin', 'TX'), ('Chicago', 'IL'),
+          ('Seattle', 'WA'), ('Nashville', 'TN'), ('Boston', 'MA'), ('Denver', 'CO'),
+          ('Los Angeles', 'CA'), ('Portland', 'OR'), ('Atlanta', 'GA'), ('Miami', 'FL'),
+          ('New Orleans', 'LA'), ('Detroit', 'MI'), ('Philadelphia', 'PA'), ('Memphis', 'TN')]
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+          'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk',
+          'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other']
+
+
+def parse_scale(value):
+    return SCALES.get(value.lower()) or int(value)
+
+
+def sizes(shows):
+    venues = max(20, shows // 50)
+    artists = max(40, shows // 25)
+    albums = artists // 2
+    return {'shows': shows, 'venues': venues, 'artists': artists, 'albums': albums, 'songs': albums * 8}
+
+
+def genre_rows():
+    return [{'id': id, 'name': name} for id, name in enumerate(GENRES, 1)]
+
+
+def entity_rows(rng, count, name, extra):
+    """Venue or artist rows, with their genre link rows."""
+    rows, links = [], []
+    today = date.today()
+    for id in range(1, count + 1):
+        city, state = rng.choice(CITIES)
+        genres = rng.sample(range(1, len(GENRES) + 1), rng.randint(1, 3))
+        row = {
+            'id': id,
+            'name': '{} {}'.format(name(rng), id),
+            'city': city,
+            'state': state,
+            'phone': '{}-{:03d}-{:04d}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+            'genres': ','.join(GENRES[genre - 1] for genre in genres),
+            'image_link': 'https://picsum.photos/seed/{}/300/300'.format(rng.randint(1, 10 ** 6)),
+            'facebook_link': '',
+            'website_link': '',
+            'seeking_description': '',
+            'listed_on': today - timedelta(days=rng.randint(0, 3 * 365)),
+            'updated_at': datetime.utcnow(),
+        }
+        row.update(extra(rng))
+        rows.append(row)
+        links.extend((id, genre) for genre in genres)
+    return rows, links
+
+
+def venue_name(rng):
+    return 'The {} {}'.format(rng.choice(WORDS), rng.choice(WORDS))
+
+
+def artist_name(rng):
+    return '{} {}'.format(rng.choice(FIRST), rng.choice(LAST))
+
+
+def show_rows(rng, count, venues, artists):
+    """Shows spread from two years ago to a year ahead, without booking conflicts.
+
+    The shows are dealt in slots at least four hours apart; within a slot
+    every venue and every artist appears at most once.
+    """
+    per_slot = min(venues, artists)
+    slots = -(-count // per_slot)
+    span = timedelta(days=3 * 365)
+    step = max(timedelta(hours=4), span / slots)
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=2 * 365)
+
+    id = 0
+    for slot in range(slots):
+        slot_start = start + step * slot
+        taken = min(per_slot, count - id)
+        for venue_id, artist_id in zip(rng.sample(range(1, venues + 1), taken),
+                                       rng.sample(range(1, artists + 1), taken)):
+            id += 1
+            yield {
+                'show_id': id,
+                'venue_id': venue_id,
+                'artist_id': artist_id,
+                'start_time': slot_start + timedelta(minutes=rng.randrange(0, 60, 15)),
+                'updated_at': datetime.utcnow(),
+            }
+
+
+def album_rows(rng, count, artists):
+    for id in range(1, count + 1):
+        yield {
+            'id': id,
+            'name': '{} {}'.format(rng.choice(WORDS), rng.choice(LAST)),
+            'description': 'Album {}'.format(id),
+            'launch_date': date.today() - timedelta(days=rng.randint(0, 20 * 365)),
+            'artist_id': rng.randint(1, artists),
+            'updated_at': datetime.utcnow(),
+        }
+
+
+def song_rows(rng, count, albums):
+    for id in range(1, count + 1):
+        yield {
+            'id': id,
+            'name': '{} {}'.format(rng.choice(FIRST), rng.choice(WORDS)),
+            'duration': clock(0, rng.randint(1, 9), rng.randint(0, 59)),
+            'album_id': (id - 1) % albums + 1,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=parse_scale, default='1k', help='1k, 100k, 1M or a number')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--drop', action='store_true', help='recreate the tables first')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    counts = sizes(args.shows)
+    app = create_app({'CACHE_TYPE': 'null'})
+    with app.app_context():
+        if args.drop:
+            db.drop_all()
+            db.create_all()
+
+        venues, venue_links = entity_rows(rng, counts['venues'], venue_name,
+                                          lambda rng: {'address': '{} {} St'.format(rng.randint(1, 999),
+                                                                                    rng.choice(WORDS)),
+                                                       'seeking_talent': rng.random() < 0.3})
+        artists, artist_links = entity_rows(rng, counts['artists'], artist_name,
+                                            lambda rng: {'seeking_venue': rng.random() < 0.3})
+        tables = [
+            (Genre, genre_rows()),
+            (Venue, venues),
+            (VenueGenres, ({'venue_id': id, 'genre_id': genre} for id, genre in venue_links)),
+            (Artist, artists),
+            (ArtistGenres, ({'artist_id': id, 'genre_id': genre} for id, genre in artist_links)),
+            (Album, album_rows(rng, counts['albums'], counts['artists'])),
+            (Songs, song_rows(rng, counts['songs'], counts['albums'])),
+            (Shows, show_rows(rng, counts['shows'], counts['venues'], counts['artists'])),
+        ]
+        for model, rows in tables:
+            table = getattr(model, '__table__', model)
+            started = time.perf_counter()
+            with db.engine.begin() as connection:
+                total = bulk.load(connection, table, rows, batch_size=args.batch_size)
+            print('{:<14} {:>9} rows  {:7.1f} s'.format(table.name, total, time.perf_counter() - started))
+
+        # the loaded rows bypass the write handlers
+        started = time.perf_counter()
+        counters.reconcile(fix=True)
+        print('{:<14} {:>9}       {:7.1f} s'.format('counters', '', time.perf_counter() - started))
+
+
+if __name__ == '__main__':
+    main()
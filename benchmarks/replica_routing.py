@@ -0,0 +1,79 @@
+"""Check read-replica routing and read-your-writes with two SQLite files.
+
+Usage:
+    python benchmarks/replica_routing.py [--dir /tmp/fyyur-replicas]
+
+The primary and the "replica" get different venues, so each page shows
+which database it was read from; replication is left out on purpose. The
+script exits with status 1 if a read went to the wrong one.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Venue  # noqa: E402
+
+VENUE_FORM = {'name': 'Fresh venue', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+              'phone': '555', 'genres': 'Jazz', 'facebook_link': '', 'image_link': '',
+              'website_link': '', 'seeking_description': ''}
+
+
+def read_from(client, path='/venues'):
+    page = client.get(path).get_data(as_text=True)
+    if 'Replica venue' in page:
+        return 'replica'
+    if 'Primary venue' in page:
+        return 'primary'
+    return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', default=tempfile.mkdtemp(prefix='fyyur-replicas-'))
+    args = parser.parse_args()
+
+    primary = 'sqlite:///' + os.path.join(args.dir, 'primary.db')
+    replica = 'sqlite:///' + os.path.join(args.dir, 'replica.db')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': primary,
+        'SQLALCHEMY_REPLICA_URIS': [replica],
+        'CACHE_TYPE': 'null',
+        'WTF_CSRF_ENABLED': False,
+    })
+
+    for url, name in ((primary, 'Primary venue'), (replica, 'Replica venue')):
+        engine = create_engine(url)
+        db.Model.metadata.drop_all(engine)
+        db.Model.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(Venue.__table__.insert(), {'name': name, 'city': 'Austin', 'state': 'TX'})
+        engine.dispose()
+
+    checks = []
+    client = app.test_client()
+    checks.append(('GET /venues', read_from(client), 'replica'))
+    client.post('/venues/create', data=VENUE_FORM)
+    checks.append(('GET /venues after a write', read_from(client), 'primary'))
+    checks.append(('GET /venues from another client', read_from(app.test_client()), 'replica'))
+    checks.append(('GET /venues/1/edit (not routed)', 'primary' if 'Primary venue' in
+                   client.get('/venues/1/edit').get_data(as_text=True) else 'replica', 'primary'))
+    app.config['DB_READ_YOUR_WRITES'] = 0
+    client.post('/venues/create', data=VENUE_FORM)
+    checks.append(('GET /venues once the window is over', read_from(client), 'replica'))
+
+    failed = False
+    for name, got, expected in checks:
+        print('{:<40} {:<8} {}'.format(name, got, 'ok' if got == expected else 'expected ' + expected))
+        failed = failed or got != expected
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
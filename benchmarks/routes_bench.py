@@ -0,0 +1,293 @@
+"""Time every route of the app through the test client.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python benchmarks/generate.py --shows 100k --drop
+    DATABASE_URL=sqlite:///bench.db python benchmarks/routes_bench.py --compare benchmarks/results/abc1234-100000.json
+
+For each route it reports the p50/p95/p99 latency over --iterations
+requests, the number of SQL statements per request (from the
+Server-Timing header) and the peak memory allocated by one request,
+traced separately so tracemalloc does not skew the timings. The results
+are written as JSON, by default under benchmarks/results/, named after
+the commit and the number of shows, so two runs can be compared with
+--compare. The response cache is off unless --cache is given. Write
+routes run against rows the script adds itself. The exit status is 1 if
+a route answered with a server error.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import counters  # noqa: E402
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Venue, Artist, Shows, Album, Songs  # noqa: E402
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+VENUE_FORM = {'name': 'Bench venue', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+              'phone': '555-000-0000', 'genres': ['Jazz', 'Blues'], 'facebook_link': '',
+              'image_link': '', 'website_link': '', 'seeking_description': ''}
+ARTIST_FORM = {'name': 'Bench artist', 'city': 'Austin', 'state': 'TX', 'phone': '555-000-0000',
+               'genres': ['Jazz'], 'facebook_link': '', 'image_link': '', 'website_link': '',
+               'seeking_description': ''}
+
+
+class Context(object):
+    """Ids to request, drawn from the catalogue and from rows added for the write routes."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.venue_ids = [id for id, in db.session.query(Venue.id).order_by(Venue.id).limit(1000)]
+        self.artist_ids = [id for id, in db.session.query(Artist.id).order_by(Artist.id).limit(1000)]
+        self.album_ids = [id for id, in db.session.query(Album.id).order_by(Album.id).limit(1000)]
+        if not (self.venue_ids and self.artist_ids and self.album_ids):
+            raise SystemExit('The database is empty, fill it with benchmarks/generate.py first.')
+        self.genre = (db.session.query(Venue.genres).filter(Venue.id == self.venue_ids[0]).scalar()
+                      or 'Jazz').split(',')[0]
+        self.term = (db.session.query(Venue.name).filter(Venue.id == self.venue_ids[0]).scalar()
+                     or 'the').split()[-2]
+
+        # rows the write routes edit, far away from the generated shows
+        # the pages split genres, rows without any would not render
+        venue = Venue(name='Bench venue', city='Austin', state='TX', genres='Jazz')
+        artist = Artist(name='Bench artist', city='Austin', state='TX', genres='Jazz')
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        album = Album(name='Bench album', artist_id=artist.id)
+        db.session.add(album)
+        db.session.commit()
+        self.venue, self.artist, self.album = venue.id, artist.id, album.id
+        self.slot = datetime(2100, 1, 1)
+
+    def venue_id(self):
+        return self.rng.choice(self.venue_ids)
+
+    def artist_id(self):
+        return self.rng.choice(self.artist_ids)
+
+    def album_id(self):
+        return self.rng.choice(self.album_ids)
+
+    def next_slot(self):
+        self.slot += timedelta(hours=4)
+        return self.slot
+
+    def scratch(self, row):
+        db.session.add(row)
+        db.session.flush()
+        if isinstance(row, Songs):
+            # counted as the song route would, the remove route takes it off again
+            counters.songs_changed(row.album_id, [row.id], 1)
+        db.session.commit()
+        return row.id
+
+
+def routes(ctx):
+    """(label, method, function returning the request) for every route."""
+    return [
+        ('GET /', 'GET', lambda: {'path': '/'}),
+        ('GET /venues', 'GET', lambda: {'path': '/venues'}),
+        ('GET /venues?page=2', 'GET', lambda: {'path': '/venues?page=2'}),
+        ('GET /venues/genres/<genre>', 'GET', lambda: {'path': '/venues/genres/' + ctx.genre}),
+        ('GET /venues/search', 'GET', lambda: {'path': '/venues/search?search_term=' + ctx.term}),
+        ('POST /venues/search', 'POST', lambda: {'path': '/venues/search', 'data': {'search_term': ctx.term}}),
+        ('GET /venues/<id>', 'GET', lambda: {'path': '/venues/{}'.format(ctx.venue_id())}),
+        ('GET /venues/<id>/edit', 'GET', lambda: {'path': '/venues/{}/edit'.format(ctx.venue_id())}),
+        ('GET /venues/create', 'GET', lambda: {'path': '/venues/create'}),
+        ('POST /venues/create', 'POST', lambda: {'path': '/venues/create', 'data': VENUE_FORM}),
+        ('POST /venues/<id>/edit', 'POST', lambda: {'path': '/venues/{}/edit'.format(ctx.venue),
+                                                    'data': VENUE_FORM}),
+        ('DELETE /venues/<id>', 'DELETE', lambda: {'path': '/venues/0', 'json': {
+            'venue': ctx.scratch(Venue(name='Scratch venue', genres='Jazz'))}}),
+        ('GET /artists', 'GET', lambda: {'path': '/artists'}),
+        ('GET /artists/genres/<genre>', 'GET', lambda: {'path': '/artists/genres/' + ctx.genre}),
+        ('GET /artists/search', 'GET', lambda: {'path': '/artists/search?search_term=' + ctx.term}),
+        ('GET /artists/<id>', 'GET', lambda: {'path': '/artists/{}'.format(ctx.artist_id())}),
+        ('GET /artists/<id>/edit', 'GET', lambda: {'path': '/artists/{}/edit'.format(ctx.artist_id())}),
+        ('GET /artists/create', 'GET', lambda: {'path': '/artists/create'}),
+        ('POST /artists/create', 'POST', lambda: {'path': '/artists/create', 'data': ARTIST_FORM}),
+        ('POST /artists/<id>/edit', 'POST', lambda: {'path': '/artists/{}/edit'.format(ctx.artist),
+                                                     'data': ARTIST_FORM}),
+        ('GET /albums', 'GET', lambda: {'path': '/albums'}),
+        ('GET /album/<id>', 'GET', lambda: {'path': '/album/{}'.format(ctx.album_id())}),
+        ('GET /album/<id>/edit', 'GET', lambda: {'path': '/album/{}/edit'.format(ctx.album_id())}),
+        ('GET /album/create', 'GET', lambda: {'path': '/album/create'}),
+        ('POST /album/create', 'POST', lambda: {'path': '/album/create', 'data': {
+            'album_name': 'Bench album', 'album_description': '', 'album_launch_date': '2020-01-01',
+            'artist': str(ctx.artist)}}),
+        ('POST /album/<id>/edit', 'POST', lambda: {'path': '/album/{}/edit'.format(ctx.album), 'data': {
+            'album_name': 'Bench album', 'album_description': '', 'album_launch_date': '2020-01-01',
+            'artist': str(ctx.artist)}}),
+        ('GET /song/create/<id>', 'GET', lambda: {'path': '/song/create/{}'.format(ctx.album)}),
+        ('POST /song/create/<id>', 'POST', lambda: {'path': '/song/create/{}'.format(ctx.album), 'data': {
+            'song_name': 'Bench song', 'song_duration': '00:03:30'}}),
+        ('DELETE /song/remove/<id>', 'DELETE', lambda: {'path': '/song/remove/0', 'json': {
+            'song': ctx.scratch(Songs(name='Scratch song', album_id=ctx.album))}}),
+        ('GET /shows', 'GET', lambda: {'path': '/shows'}),
+        ('GET /shows?when=upcoming', 'GET', lambda: {'path': '/shows?when=upcoming'}),
+        ('GET /shows?venue_id=<id>', 'GET', lambda: {'path': '/shows?venue_id={}'.format(ctx.venue_id())}),
+        ('GET /shows/create', 'GET', lambda: {'path': '/shows/create'}),
+        ('POST /shows/create', 'POST', lambda: {'path': '/shows/create', 'data': {
+            'artist_id': str(ctx.artist), 'venue_id': str(ctx.venue),
+            'start_time': ctx.next_slot().strftime('%Y-%m-%d %H:%M:%S')}}),
+        ('POST /shows/batch', 'POST', lambda: {'path': '/shows/batch', 'json': {'shows': [
+            {'artist_id': ctx.artist, 'venue_id': ctx.venue, 'start_time': ctx.next_slot().isoformat()}
+            for _ in range(10)]}}),
+        ('GET /autocomplete?q=<prefix>', 'GET', lambda: {'path': '/autocomplete?q=' + ctx.term[:3]}),
+        ('GET /lookup/artists?q=<prefix>', 'GET', lambda: {'path': '/lookup/artists?q=' + ctx.term[:2]}),
+        ('GET /export/shows.csv', 'GET', lambda: {'path': '/export/shows.csv'}),
+        ('GET /cache/stats', 'GET', lambda: {'path': '/cache/stats'}),
+        ('GET /metrics', 'GET', lambda: {'path': '/metrics'}),
+    ]
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def request(client, method, spec):
+    response = client.open(spec.pop('path'), method=method, **spec)
+    # reading the body runs the streamed responses to the end
+    response.get_data()
+    return response
+
+
+def measure(app, client, method, make, iterations, warmup):
+    timings, queries, statuses = [], [], set()
+    for index in range(warmup + iterations):
+        with app.app_context():
+            spec = make()
+        started = time.perf_counter()
+        response = request(client, method, spec)
+        elapsed = time.perf_counter() - started
+        if index >= warmup:
+            timings.append(elapsed * 1000)
+            match = QUERIES.search(response.headers.get('Server-Timing', ''))
+            queries.append(int(match.group(1)) if match else 0)
+            statuses.add(response.status_code)
+
+    with app.app_context():
+        spec = make()
+    tracemalloc.start()
+    request(client, method, spec)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': sorted(queries)[len(queries) // 2],
+        'peak_kb': round(peak / 1024, 1),
+        'status': sorted(statuses),
+    }
+
+
+def revision():
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                      universal_newlines=True).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                             cwd=ROOT, universal_newlines=True).strip())
+        return rev, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def compare(results, path):
+    with open(path) as f:
+        baseline = json.load(f)['routes']
+    print('\nAgainst {}:'.format(path))
+    print('{:<32} {:>10} {:>10} {:>8} {:>9}'.format('route', 'p50', 'p95', 'queries', 'peak'))
+    for label, now in results.items():
+        before = baseline.get(label)
+        if not before:
+            continue
+        print('{:<32} {:>+9.1f}% {:>+9.1f}% {:>+8d} {:>+8.0f}k'.format(
+            label,
+            (now['p50_ms'] / before['p50_ms'] - 1) * 100 if before['p50_ms'] else 0.0,
+            (now['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0.0,
+            now['queries'] - before['queries'],
+            now['peak_kb'] - before['peak_kb']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--routes', default='', help='only the routes whose label contains this')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache on')
+    parser.add_argument('--output', help='defaults to benchmarks/results/<commit>-<shows>.json')
+    parser.add_argument('--compare', help='a previous results file')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    # flask_wtf.Form is deprecated, once per request is noise here
+    warnings.simplefilter('ignore', DeprecationWarning)
+
+    app = create_app({
+        'CACHE_TYPE': 'memory' if args.cache else 'null',
+        'WTF_CSRF_ENABLED': False,
+        'SQL_NPLUS1_RAISE': False,
+    })
+    # no session cookie, or the flashed messages of the write routes would pile up
+    client = app.test_client(use_cookies=False)
+
+    with app.app_context():
+        ctx = Context(random.Random(args.seed))
+        rows = {model.__tablename__: db.session.query(model).count()
+                for model in (Venue, Artist, Shows, Album, Songs)}
+        dialect = db.engine.dialect.name
+
+    results = {}
+    failed = False
+    for label, method, make in routes(ctx):
+        if args.routes not in label:
+            continue
+        result = results[label] = measure(app, client, method, make, args.iterations, args.warmup)
+        failed = failed or any(status >= 500 for status in result['status'])
+        print('{:<32} p50 {:8.2f}  p95 {:8.2f}  p99 {:8.2f} ms  {:4d} queries  {:8.1f} KiB  {}'.format(
+            label, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['queries'],
+            result['peak_kb'], ','.join(str(status) for status in result['status'])))
+
+    rev, dirty = revision()
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results',
+                                         '{}{}-{}.json'.format(rev, '-dirty' if dirty else '', rows['Shows']))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'meta': {
+                'revision': rev,
+                'dirty': dirty,
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'python': sys.version.split()[0],
+                'database': dialect,
+                'rows': rows,
+                'iterations': args.iterations,
+                'cache': args.cache,
+            },
+            'routes': results,
+        }, f, indent=2, sort_keys=True)
+    print('Results written to {}'.format(output))
+
+    if args.compare:
+        compare(results, args.compare)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Compare the indexed venue search with the ILIKE scan it replaces.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python benchmarks/search_bench.py --rows 50000
+
+Missing rows are generated first, so the database should be a scratch one.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Venue  # noqa: E402
+import search  # noqa: E402
+
+WORDS = ['Blue', 'Note', 'Jazz', 'Hall', 'Park', 'Cellar', 'Lounge', 'Room', 'House', 'Club',
+         'Garden', 'Theatre', 'Dome', 'Arena', 'Underground', 'Tavern', 'Loft', 'Basement']
+CITIES = [('New York', 'NY'), ('San Francisco', 'CA'), ('Austin', 'TX'), ('Chicago', 'IL'),
+          ('Seattle', 'WA'), ('Nashville', 'TN'), ('Boston', 'MA'), ('Denver', 'CO')]
+GENRES = ['Jazz', 'Blues', 'Rock n Roll', 'Folk', 'Soul', 'Funk', 'Classical', 'Pop']
+TERMS = ['jazz', 'blue note', 'Hall', 'under', 'austin', 'TX', 'cellar lounge', 'zzz']
+
+
+def populate(rows):
+    existing = db.session.query(Venue).count()
+    rng = random.Random(42)
+    batch = []
+    for i in range(existing, rows):
+        city, state = rng.choice(CITIES)
+        batch.append({
+            'name': '{} {} {}'.format(rng.choice(WORDS), rng.choice(WORDS), i),
+            'city': city,
+            'state': state,
+            'genres': ','.join(rng.sample(GENRES, 2)),
+        })
+        if len(batch) == 5000:
+            db.session.bulk_insert_mappings(Venue, batch)
+            batch = []
+    if batch:
+        db.session.bulk_insert_mappings(Venue, batch)
+    db.session.commit()
+
+
+def timed(backend, repeat):
+    timings = []
+    for _ in range(repeat):
+        for term in TERMS:
+            started = time.perf_counter()
+            search.search(db.session, Venue, term, backend=backend)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return sum(timings) / len(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        db.create_all()
+        with db.engine.begin() as connection:
+            search.install(connection, Venue)
+        populate(args.rows)
+
+        dialect = db.engine.dialect.name
+        print('{} venues on {}'.format(db.session.query(Venue).count(), dialect))
+        for backend in ('ilike', dialect):
+            mean, p95 = timed(backend, args.repeat)
+            print('{:<12} mean {:8.2f} ms   p95 {:8.2f} ms'.format(backend, mean, p95))
+
+
+if __name__ == '__main__':
+    main()
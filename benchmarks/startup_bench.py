@@ -0,0 +1,60 @@
+"""Measure how long a fresh process takes to import, build and serve the app.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python benchmarks/startup_bench.py --runs 10
+
+Each run is a new interpreter, so nothing is shared between them: the
+times are those of a cold worker (or of a CLI command). The first request
+goes to --path, /metrics by default as it renders without the database.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+built = time.perf_counter()
+response = app.test_client().get({path!r})
+served = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (built - imported) * 1000,
+    'first_request_ms': (served - built) * 1000,
+    'status': response.status_code,
+    'modules': len(sys.modules),
+}}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/metrics')
+    args = parser.parse_args()
+
+    probe = PROBE.format(root=ROOT, path=args.path)
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, '-c', probe], check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    print('{} runs, first request {} -> {}, {} modules loaded'.format(
+        len(runs), args.path, runs[0]['status'], runs[0]['modules']))
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms'):
+        values = [run[key] for run in runs]
+        print('{:<18} median {:8.2f} ms   min {:8.2f} ms'.format(key, statistics.median(values), min(values)))
+
+
+if __name__ == '__main__':
+    main()
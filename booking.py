@@ -0,0 +1,114 @@
+# ----------------------------------------------------------------------------#
+# Booking conflicts enforced by the database.
+#
+# A show takes a SHOW_SLOT long slot from its start time, and neither its
+# artist nor its venue can have another show overlapping that slot.
+# PostgreSQL: two exclusion constraints over a tsrange (needs btree_gist).
+# SQLite: triggers aborting the conflicting insert/update; SQLite runs one
+# writer at a time, so the check and the write cannot interleave.
+# ----------------------------------------------------------------------------#
+
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from sqlalchemy import DDL, event, text
+
+SHOW_SLOT = timedelta(hours=3)
+
+
+def _postgres_ddl(table_name):
+    slot = "tsrange(start_time, start_time + interval '{} seconds')".format(int(SHOW_SLOT.total_seconds()))
+    statements = ['CREATE EXTENSION IF NOT EXISTS btree_gist']
+    for key in ('artist_id', 'venue_id'):
+        constraint = '{}_{}_no_overlap'.format(table_name, key)
+        # ALTER TABLE has no IF NOT EXISTS for constraints
+        statements.append(
+            "DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = '{0}') THEN "
+            'ALTER TABLE "{1}" ADD CONSTRAINT "{0}" EXCLUDE USING gist ({2} WITH =, {3} WITH &&); '
+            'END IF; END $$'.format(constraint, table_name, key, slot))
+    return statements
+
+
+def _sqlite_ddl(table_name):
+    seconds = int(SHOW_SLOT.total_seconds())
+    # the string range keeps the lookup on the (key, start_time) indexes,
+    # julianday() then decides the exact overlap
+    clash = ('SELECT 1 FROM "{0}" WHERE {{key}} = NEW.{{key}} {{other}}'
+             "AND start_time >= datetime(NEW.start_time, '-{1} seconds') "
+             "AND start_time <= datetime(NEW.start_time, '+{2} seconds') "
+             'AND abs(julianday(start_time) - julianday(NEW.start_time)) * 86400 < {1}'
+             ).format(table_name, seconds, seconds + 1)
+    statements = []
+    for action, other in (('INSERT', ''), ('UPDATE', 'AND show_id != NEW.show_id ')):
+        condition = ' OR '.join('EXISTS ({})'.format(clash.format(key=key, other=other))
+                                for key in ('artist_id', 'venue_id'))
+        statements.append(
+            'CREATE TRIGGER IF NOT EXISTS "{0}_no_overlap_{1}" BEFORE {2} ON "{0}" '
+            'WHEN {3} BEGIN SELECT RAISE(ABORT, \'show booking conflict\'); END'
+            .format(table_name, action.lower(), action, condition))
+    return statements
+
+
+def register(model):
+    """Create the booking constraints whenever the model's table is created."""
+    table_name = model.__tablename__
+    for statement in _postgres_ddl(table_name):
+        event.listen(model.__table__, 'after_create',
+                     DDL(statement).execute_if(dialect='postgresql'))
+    for statement in _sqlite_ddl(table_name):
+        event.listen(model.__table__, 'after_create',
+                     DDL(statement).execute_if(dialect='sqlite'))
+
+
+def install(connection, model):
+    """Add the booking constraints to an existing table.
+
+    Fails on PostgreSQL if the table already holds overlapping shows.
+    """
+    table_name = model.__tablename__
+    if connection.dialect.name == 'postgresql':
+        for statement in _postgres_ddl(table_name):
+            connection.execute(text(statement))
+    elif connection.dialect.name == 'sqlite':
+        for statement in _sqlite_ddl(table_name):
+            connection.execute(text(statement))
+
+
+def _clash(slots, start_time):
+    # slots is a sorted list of (start_time, label)
+    i = bisect_left(slots, (start_time - SHOW_SLOT,))
+    while i < len(slots) and slots[i][0] < start_time + SHOW_SLOT:
+        if slots[i][0] > start_time - SHOW_SLOT:
+            return slots[i][1]
+        i += 1
+    return None
+
+
+def plan(rows, existing=()):
+    """Conflict reason for every ``(row, artist_id, venue_id, start_time)`` row.
+
+    ``None`` means the row can be booked. Rows are taken in order, so a
+    row clashing with an earlier accepted row of the same batch is refused,
+    as is a row clashing with one of the ``existing`` shows. ``row`` is the
+    number the reasons name the accepted rows by, i.e. their position in
+    the request.
+    """
+    slots = {}
+    for artist_id, venue_id, start_time in existing:
+        insort(slots.setdefault(('artist', artist_id), []), (start_time, 'an existing show'))
+        insort(slots.setdefault(('venue', venue_id), []), (start_time, 'an existing show'))
+
+    reasons = []
+    for row, artist_id, venue_id, start_time in rows:
+        reason = None
+        for kind, key in (('artist', artist_id), ('venue', venue_id)):
+            clash = _clash(slots.get((kind, key), []), start_time)
+            if clash:
+                reason = '{} {} is already booked by {}'.format(kind, key, clash)
+                break
+        if reason is None:
+            label = 'row {}'.format(row)
+            insort(slots.setdefault(('artist', artist_id), []), (start_time, label))
+            insort(slots.setdefault(('venue', venue_id), []), (start_time, label))
+        reasons.append(reason)
+    return reasons
@@ -0,0 +1,171 @@
+# ----------------------------------------------------------------------------#
+# Bulk loading and dumping of whole tables.
+#
+# Rows are streamed from/to CSV (with a header line) or NDJSON files and
+# written in batches: COPY on PostgreSQL, executemany everywhere else.
+# ----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from datetime import date, datetime, time
+from itertools import islice
+
+from sqlalchemy import Boolean, Date, DateTime, Integer, String, Time, func, select, text
+
+FORMATS = ('csv', 'ndjson')
+
+
+def guess_format(path):
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Yield the rows of a CSV or NDJSON stream as dicts."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _coerce(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, String):
+        # an empty cell is an empty string, as the forms store it
+        return value
+    if value == '':
+        return None
+    if isinstance(column.type, Boolean):
+        return value if isinstance(value, bool) else str(value).lower() in ('1', 'y', 'yes', 't', 'true')
+    if isinstance(column.type, Integer):
+        return int(value)
+    if isinstance(column.type, DateTime):
+        return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if isinstance(column.type, Date):
+        return value if isinstance(value, date) else date.fromisoformat(value)
+    if isinstance(column.type, Time):
+        return value if isinstance(value, time) else time.fromisoformat(value)
+    return value
+
+
+def convert(table, row):
+    """Keep the known columns of a row and give them their column's type."""
+    return {name: _coerce(table.c[name], value)
+            for name, value in row.items() if name in table.c}
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _copy(connection, table, batch):
+    columns = sorted({name for row in batch for name in row})
+    buffer = io.StringIO()
+    for row in batch:
+        buffer.write(','.join(_copy_value(row.get(name)) for name in columns) + '\n')
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert("COPY \"{}\" ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')".format(
+            table.name, ', '.join('"{}"'.format(name) for name in columns)), buffer)
+    finally:
+        cursor.close()
+
+
+def _copy_value(value):
+    # every value but NULL is quoted: a quoted \N or "" is text, not NULL
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        value = 't' if value else 'f'
+    elif isinstance(value, (date, time)):
+        value = value.isoformat()
+    return '"{}"'.format(str(value).replace('"', '""'))
+
+
+def load(connection, table, rows, batch_size=5000, progress=None):
+    """Insert the converted rows in batches, returns the number of rows.
+
+    ``progress`` is called with the running total after every batch.
+    """
+    postgres = connection.dialect.name == 'postgresql'
+    total = 0
+    for batch in batches((convert(table, row) for row in rows), batch_size):
+        if postgres:
+            _copy(connection, table, batch)
+        else:
+            connection.execute(table.insert(), batch)
+        total += len(batch)
+        if progress:
+            progress(total)
+
+    if postgres and total:
+        # COPY bypasses the sequence when ids are given
+        for column in table.primary_key.columns:
+            if isinstance(column.type, Integer) and column.autoincrement:
+                connection.execute(text(
+                    "SELECT setval(pg_get_serial_sequence('\"{0}\"', '{1}'), "
+                    "coalesce((SELECT max(\"{1}\") FROM \"{0}\"), 0) + 1, false)"
+                    .format(table.name, column.name)))
+    return total
+
+
+def iter_rows(connection, table, batch_size=5000, progress=None):
+    """Yield every row of the table as a dict, through a server-side cursor.
+
+    ``progress`` is called with the running total after every batch.
+    """
+    result = connection.execution_options(stream_results=True) \
+        .execute(select(table).order_by(*table.primary_key.columns))
+    total = 0
+    for partition in result.mappings().partitions(batch_size):
+        for row in partition:
+            yield dict(row)
+        total += len(partition)
+        if progress:
+            progress(total)
+
+
+def count(connection, table):
+    return connection.execute(select(func.count()).select_from(table)).scalar()
+
+
+def _json_default(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def encode_rows(table, rows, fmt, chunk_size=16384):
+    """Yield the rows encoded as CSV (header first) or NDJSON text.
+
+    The first row goes out on its own so a download starts right away,
+    the rest is grouped in chunks of about ``chunk_size`` characters.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns = table.c.keys()
+    if fmt == 'csv':
+        writer.writerow(columns)
+
+    first = True
+    for row in rows:
+        if fmt == 'csv':
+            writer.writerow([_copy_value(row[name]) for name in columns])
+        else:
+            buffer.write(json.dumps(row, default=_json_default) + '\n')
+        if first or buffer.tell() >= chunk_size:
+            first = False
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,272 @@
+# ----------------------------------------------------------------------------#
+# Response cache for read pages.
+#
+# Pages are cached under their path and the versions of the tags they
+# depend on (e.g. 'venue:3', 'shows'). Write handlers invalidate a tag by
+# bumping its version, so every page built from it misses from then on
+# and the stale entries simply age out of the LRU.
+#
+# Backends: 'memory' (in-process LRU with TTL, per worker), 'redis'
+# (shared by every worker, needs the redis package) and 'null'.
+#
+# conditional() answers ETag/Last-Modified revalidations with a 304 and
+# FragmentCacheExtension caches parts of templates ({% cache %}).
+# ----------------------------------------------------------------------------#
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, request, session, make_response
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class NullCache(object):
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def get_counters(self, names):
+        return [0] * len(names)
+
+    def incr(self, name):
+        pass
+
+
+class MemoryCache(object):
+    """Bounded LRU with a TTL per entry, safe to share between threads."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # tag versions live apart from the LRU so they are never evicted
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_counters(self, names):
+        return [self._counters.get(name, 0) for name in names]
+
+    def incr(self, name):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache(object):
+    """Cache shared by every worker, a local redis-server can stand in for it."""
+
+    def __init__(self, url, prefix='fyyur:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_TYPE 'redis' needs the redis package: pip install redis")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, timeout):
+        self.client.set(self.prefix + key, value, ex=int(timeout))
+
+    def get_counters(self, names):
+        if not names:
+            return []
+        return [int(value or 0) for value in self.client.mget([self.prefix + name for name in names])]
+
+    def incr(self, name):
+        self.client.incr(self.prefix + name)
+
+
+class ResponseCache(object):
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.default_timeout = 60
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config.get('CACHE_TYPE', 'memory')
+        if kind == 'memory':
+            self.backend = MemoryCache(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        elif kind == 'redis':
+            self.backend = RedisCache(app.config['CACHE_URL'])
+        else:
+            self.backend = NullCache()
+        self.default_timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 60)
+        app.extensions['response_cache'] = self
+
+    def _key(self, tags):
+        versions = self.backend.get_counters(['tag:' + tag for tag in tags])
+        # under conditional(), the ETag too: a page is never sent with the
+        # ETag of a newer version of its row, which would then revalidate
+        return 'page:{}|{}|{}'.format(request.full_path,
+                                      ','.join('{}={}'.format(tag, version) for tag, version in zip(tags, versions)),
+                                      g.get('etag', ''))
+
+    def cached(self, *tags, timeout=None):
+        """Cache a GET view under the given tags.
+
+        Tags are formatted with the view arguments, e.g. 'venue:{venue_id}'.
+        Responses are not cached while flashed messages are pending, as the
+        layout renders them into the page, nor while the client is in its
+        read-your-writes window (see routing.py), so it sees what it just
+        saved rather than a page cached before.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if (request.method != 'GET' or '_flashes' in session or
+                        session.get('db_primary_until', 0) > time.time()):
+                    return view(*args, **kwargs)
+
+                key = self._key([tag.format(**kwargs) for tag in tags])
+                value = self.backend.get(key)
+                if value is not None:
+                    self.hits += 1
+                    content_type, _, body = value.partition(b'\n')
+                    response = make_response(body)
+                    response.content_type = content_type.decode()
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self.misses += 1
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(key, response.content_type.encode() + b'\n' + response.get_data(),
+                                     timeout or self.default_timeout)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.incr('tag:' + tag)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def conditional(version):
+    """Answer conditional GETs of a view from a cheap version lookup.
+
+    ``version`` gets the view arguments and returns a row whose first
+    column is the last modification time, or None when there is nothing
+    to describe (the view then runs as usual, e.g. to answer 404). When
+    the ETag or Last-Modified built from it still matches, the view is
+    skipped and a 304 is returned. Otherwise the ETag is left in ``g.etag``
+    for a response_cache.cached() view to key its page with.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or '_flashes' in session:
+                return view(*args, **kwargs)
+            current = version(**kwargs)
+            if current is None:
+                return view(*args, **kwargs)
+
+            last_modified = current[0].replace(microsecond=0) if current[0] else None
+            token = '{}|{}'.format(request.full_path, '|'.join(str(value) for value in current))
+            etag = hashlib.sha1(token.encode()).hexdigest()
+
+            if request.if_none_match:
+                # weak: the compressed responses carry W/ ETags
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = bool(last_modified and request.if_modified_since and
+                                    last_modified <= request.if_modified_since.replace(tzinfo=None))
+
+            if not_modified:
+                response = Response(status=304)
+            else:
+                g.etag = etag
+                response = make_response(view(*args, **kwargs))
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+class FragmentCacheExtension(Extension):
+    """Cache a block of template output: {% cache key, timeout %}...{% endcache %}.
+
+    The key is a value or a list of values, e.g. ['show', show.show_id,
+    show.updated_at], so an edit changes the key and the old fragment
+    ages out. The timeout (seconds) is optional. Fragments are kept in the
+    environment's ``fragment_cache``, a bounded MemoryCache by default.
+    """
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super(FragmentCacheExtension, self).__init__(environment)
+        environment.extend(fragment_cache=MemoryCache(), fragment_cache_timeout=300)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        args.append(nodes.Const(parser.name))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache', args), [], [], body).set_lineno(lineno)
+
+    def _cache(self, key, timeout, template, caller):
+        if isinstance(key, (list, tuple)):
+            key = ':'.join(str(part) for part in key)
+        key = 'fragment:{}:{}'.format(template, key)
+        value = self.environment.fragment_cache.get(key)
+        if value is None:
+            value = caller()
+            self.environment.fragment_cache.set(key, value, timeout or self.environment.fragment_cache_timeout)
+        return value
@@ -0,0 +1,198 @@
+# ----------------------------------------------------------------------------#
+# CLI commands.
+# ----------------------------------------------------------------------------#
+
+import os
+import shutil
+import sys
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+import assets
+import booking
+import bulk
+import counters
+import search
+from extensions import db, response_cache
+from helpers import get_genres, install_updated_at
+from models import Genre, VenueGenres, ArtistGenres, Venue, Artist, Shows, BULK_MODELS
+
+
+@click.command('booking-constraints')
+@with_appcontext
+def booking_constraints():
+    """Add the show booking conflict constraints to an existing database."""
+    with db.engine.begin() as connection:
+        booking.install(connection, Shows)
+    click.echo('Booking constraints are in place.')
+
+
+@click.command('search-index')
+@with_appcontext
+def search_index():
+    """Create and rebuild the venue/artist search indexes."""
+    with db.engine.begin() as connection:
+        search.install(connection, Venue)
+        search.install(connection, Artist)
+    click.echo('Search indexes are up to date.')
+
+
+@click.command('updated-at')
+@with_appcontext
+def updated_at():
+    """Add the updated_at columns to an existing database and fill them."""
+    with db.engine.begin() as connection:
+        added = install_updated_at(connection)
+    click.echo('Added updated_at to {}.'.format(', '.join(added)) if added else 'The columns are in place.')
+
+
+@click.command('normalize-genres')
+@with_appcontext
+def normalize_genres():
+    """Fill the Genre tables from the comma-joined genres strings."""
+    for model, table, key in ((Venue, VenueGenres, 'venue_id'), (Artist, ArtistGenres, 'artist_id')):
+        rows = db.session.query(model.id, model.genres).all()
+        get_genres(name for row in rows for name in (row.genres or '').split(','))
+        db.session.flush()
+        genres = {genre.name: genre.id for genre in Genre.query.all()}
+
+        links = [{key: row.id, 'genre_id': genres[name]}
+                 for row in rows
+                 for name in {name.strip() for name in (row.genres or '').split(',')}
+                 if name]
+        db.session.execute(table.delete())
+        if links:
+            db.session.execute(table.insert(), links)
+        click.echo('{}: {} genre links for {} rows'.format(model.__tablename__, len(links), len(rows)))
+    db.session.commit()
+
+
+data_cli = AppGroup('data', help='Bulk import and export of catalogue tables.')
+
+
+@data_cli.command('import')
+@click.argument('entity', type=click.Choice(sorted(BULK_MODELS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(bulk.FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, help='Defaults to BULK_BATCH_SIZE.')
+def data_import(entity, path, fmt, batch_size):
+    """Load a CSV or NDJSON file into a table, in one transaction."""
+    batch_size = batch_size or current_app.config.get('BULK_BATCH_SIZE', 5000)
+    table = BULK_MODELS[entity].__table__
+    with open(path, newline='', encoding='utf-8') as stream, db.engine.begin() as connection:
+        total = bulk.load(connection, table, bulk.read_rows(stream, fmt or bulk.guess_format(path)),
+                          batch_size=batch_size,
+                          progress=lambda done: click.echo('{}: {} rows'.format(entity, done), err=True))
+    click.echo('Imported {} {}.'.format(total, entity))
+    if entity in ('venues', 'artists'):
+        click.echo("Run 'flask normalize-genres' to index their genres.")
+    click.echo("Run 'flask counters reconcile --fix' to count the imported rows.")
+
+
+@data_cli.command('export')
+@click.argument('entity', type=click.Choice(sorted(BULK_MODELS)))
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(bulk.FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, help='Defaults to BULK_BATCH_SIZE.')
+def data_export(entity, path, fmt, batch_size):
+    """Dump a table to a CSV or NDJSON file."""
+    batch_size = batch_size or current_app.config.get('BULK_BATCH_SIZE', 5000)
+    table = BULK_MODELS[entity].__table__
+    with open(path, 'w', newline='', encoding='utf-8') as stream, db.engine.connect() as connection:
+        rows = bulk.iter_rows(connection, table, batch_size,
+                              progress=lambda done: click.echo('{}: {} rows'.format(entity, done), err=True))
+        for chunk in bulk.encode_rows(table, rows, fmt or bulk.guess_format(path)):
+            stream.write(chunk)
+    click.echo('Exported {} to {}.'.format(entity, path))
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db():
+    """Create the tables, with their search indexes and booking constraints."""
+    db.create_all()
+    click.echo('Tables are in place.')
+
+
+assets_cli = AppGroup('assets', help='The bundled, fingerprinted and precompressed static files.')
+
+
+@assets_cli.command('build')
+@click.option('--gzip-level', type=click.IntRange(1, 9), default=9)
+@with_appcontext
+def assets_build(gzip_level):
+    """Write static/dist/ and its manifest, picked up by the next app start."""
+    files = assets.Builder(current_app.static_folder, gzip_level=gzip_level,
+                           keep=current_app.config.get('ASSETS_KEEP', 2)).build()
+    click.echo('Built {} files in {}.'.format(len(files), os.path.join(current_app.static_folder, assets.OUTPUT)))
+
+
+@assets_cli.command('clean')
+@with_appcontext
+def assets_clean():
+    """Remove static/dist/, back to serving the source files."""
+    shutil.rmtree(os.path.join(current_app.static_folder, assets.OUTPUT), ignore_errors=True)
+    click.echo('Removed the built assets.')
+
+
+counters_cli = AppGroup('counters', help='The show and song counters of the venues, artists and albums.')
+
+
+@counters_cli.command('roll')
+@click.option('--every', type=int, help='Keep running, rolling every that many seconds.')
+@click.option('--batch-size', type=int, default=5000)
+def counters_roll(every, batch_size):
+    """Move the shows that have started from the upcoming to the past counters."""
+    def invalidate(venue_ids, artist_ids):
+        response_cache.invalidate(*['venue:{}'.format(id) for id in venue_ids],
+                                  *['artist:{}'.format(id) for id in artist_ids])
+
+    while True:
+        moved = counters.roll(batch_size=batch_size, on_batch=invalidate)
+        db.session.remove()
+        if moved or not every:
+            click.echo('Moved {} shows to the past.'.format(moved))
+        if not every:
+            return
+        time.sleep(every)
+
+
+@counters_cli.command('reconcile')
+@click.option('--fix', is_flag=True, help='Recount the rows that drifted.')
+def counters_reconcile(fix):
+    """Recount every counter and report the rows that drifted.
+
+    --fix writes the recounts as absolute values, run it while no shows
+    or songs are being added.
+    """
+    report = counters.reconcile(fix=fix)
+    for table, (drifted, sample) in report.items():
+        click.echo('{}: {} {}'.format(table, drifted, 'stale flags' if table == 'Shows' else 'rows drifted'))
+        for id, stored, actual in sample:
+            click.echo('  {} {}: stored {}, counted {}'.format(table, id, tuple(stored), tuple(actual)))
+    if fix:
+        # the detail pages are tagged with the names of the other kind
+        response_cache.invalidate('venues', 'albums', 'venue-names', 'artist-names')
+        click.echo('Fixed.')
+    elif any(drifted for drifted, _ in report.values()):
+        sys.exit(1)
+
+
+@counters_cli.command('install')
+def counters_install():
+    """Add the counter columns to an existing database and fill them."""
+    with db.engine.begin() as connection:
+        added = counters.install(connection)
+    click.echo('Added {}.'.format(', '.join(added)) if added else 'The columns are in place.')
+    report = counters.reconcile(fix=True)
+    click.echo('Filled the counters of {} venues, {} artists and {} albums.'.format(
+        report['Venue'][0], report['Artist'][0], report['Album'][0]))
+
+
+def init_app(app):
+    for command in (init_db, booking_constraints, search_index, updated_at, normalize_genres, data_cli,
+                    assets_cli, counters_cli):
+        app.cli.add_command(command)
@@ -0,0 +1,204 @@
+# ----------------------------------------------------------------------------#
+# Response compression.
+#
+# WSGI middleware compressing the text responses (COMPRESS_MIMETYPES) with
+# the best encoding the client accepts: brotli (brotli package) or gzip.
+#
+# Responses with a Content-Length are compressed in one go, unless they are
+# smaller than COMPRESS_MIN_SIZE. Streamed responses (generators, e.g. the
+# exports) are compressed chunk by chunk and flushed after every chunk the
+# app yields, so the client still gets them as they come. Responses that
+# already have a Content-Encoding (the precompressed static files) are
+# passed through.
+#
+# COMPRESS_LEVEL (gzip, 1-9) and COMPRESS_BR_LEVEL (brotli, 0-11) trade CPU
+# for bytes; benchmarks/compress_bench.py measures both on real pages.
+# ----------------------------------------------------------------------------#
+
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_options_header
+
+DEFAULT_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/xml', 'text/javascript',
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+    'image/svg+xml',
+)
+
+
+def gzip_compressor(level):
+    # wbits 31: the gzip container around the deflate stream
+    return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+
+class GzipStream(object):
+
+    def __init__(self, level):
+        self._compressor = gzip_compressor(level)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliStream(object):
+
+    def __init__(self, level):
+        import brotli
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def brotli_available():
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class CompressedBody(object):
+    """The app's response iterable, compressed as it is read."""
+
+    def __init__(self, body, stream):
+        self.body = body
+        self.stream = stream
+
+    def __iter__(self):
+        for chunk in self.body:
+            if chunk:
+                data = self.stream.compress(chunk) + self.stream.flush()
+                if data:
+                    yield data
+        yield self.stream.finish()
+
+    def close(self):
+        if hasattr(self.body, 'close'):
+            self.body.close()
+
+
+class Compress(object):
+    """WSGI middleware compressing the responses of an app."""
+
+    def __init__(self, app=None):
+        self.wsgi_app = None
+        self.level = 6
+        self.br_level = 4
+        self.min_size = 500
+        self.mimetypes = frozenset(DEFAULT_MIMETYPES)
+        self.encodings = ()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.br_level = app.config.get('COMPRESS_BR_LEVEL', 4)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        self.mimetypes = frozenset(app.config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES))
+        # best first
+        self.encodings = (('br',) if brotli_available() else ()) + ('gzip',)
+
+        self.wsgi_app = app.wsgi_app
+        app.wsgi_app = self
+        app.extensions['compress'] = self
+
+    def negotiate(self, environ):
+        """The encoding to use, or None; the client's preference wins, ours breaks ties."""
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        best, best_quality = None, 0
+        for encoding in self.encodings:
+            quality = accepted[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def stream(self, encoding):
+        if encoding == 'br':
+            return BrotliStream(self.br_level)
+        return GzipStream(self.level)
+
+    def compressible(self, status, headers):
+        if not status.startswith('2') or status.startswith(('204', '206')):
+            return False
+        if 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        mimetype = parse_options_header(headers.get('Content-Type', ''))[0]
+        return mimetype in self.mimetypes
+
+    def __call__(self, environ, start_response):
+        encoding = self.negotiate(environ)
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            # the pages can still be compressed for the next client, tell the caches
+            return self.wsgi_app(environ, self._vary(start_response))
+
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, Headers(headers), exc_info]
+            # the body is written through the returned iterable, never through write()
+            return lambda data: None
+
+        body = self.wsgi_app(environ, capture)
+        status, headers, exc_info = captured
+        if not self.compressible(status, headers):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return body
+
+        length = headers.get('Content-Length', type=int)
+        if length is not None and length < self.min_size:
+            self._add_vary(headers)
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return body
+
+        headers['Content-Encoding'] = encoding
+        self._add_vary(headers)
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # the bytes differ from the uncompressed response's
+            headers['ETag'] = 'W/' + etag
+
+        stream = self.stream(encoding)
+        if length is not None:
+            # a body of known size: one pass, and a new Content-Length
+            try:
+                data = stream.compress(b''.join(body)) + stream.finish()
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+            headers['Content-Length'] = str(len(data))
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return [data]
+
+        headers.pop('Content-Length', None)
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return CompressedBody(body, stream)
+
+    def _add_vary(self, headers):
+        vary = [value.strip() for value in headers.get('Vary', '').split(',') if value.strip()]
+        if 'accept-encoding' not in (value.lower() for value in vary):
+            vary.append('Accept-Encoding')
+            headers['Vary'] = ', '.join(vary)
+
+    def _vary(self, start_response):
+        def vary_start_response(status, headers, exc_info=None):
+            headers = Headers(headers)
+            if self.compressible(status, headers):
+                self._add_vary(headers)
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+        return vary_start_response
@@ -0,0 +1,186 @@
+# ----------------------------------------------------------------------------#
+# Show and song counters.
+#
+# Venue and Artist rows keep their numbers of upcoming and past shows, Album
+# rows their number of songs and total duration, so the pages read them off
+# the row instead of counting the related rows on every request.
+#
+# A show counts as upcoming until it is flagged past (Shows.is_past): at
+# insert time when it starts in the past, otherwise by roll(), which the
+# scheduler runs every minute or so ('flask counters roll'). The detail
+# pages list the shows by the same flag, so the lists and the counts agree.
+#
+# The write handlers adjust the counters in their own transaction with
+# relative updates (count = count + n), so concurrent writes add up. The
+# counter UPDATE bumps updated_at like helpers.touch() does.
+#
+# reconcile() recounts everything in bulk and reports, or fixes, the rows
+# that drifted: 'flask counters reconcile [--fix]'. install() adds the
+# columns to an existing database and fills them.
+# ----------------------------------------------------------------------------#
+
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, func, inspect, select
+from sqlalchemy.schema import CreateColumn
+
+from extensions import db
+from helpers import time_seconds
+from models import Venue, Artist, Shows, Album, Songs
+
+SHOW_COUNTERS = ('upcoming_shows_count', 'past_shows_count')
+SONG_COUNTERS = ('songs_count', 'songs_seconds')
+
+
+def _bump(model, columns, deltas):
+    # one executemany of relative updates, {id: (delta per column)}
+    rows = [dict(_id=id, **{'_' + column: delta for column, delta in zip(columns, values)})
+            for id, values in deltas.items() if id is not None and any(values)]
+    if rows:
+        table = model.__table__
+        statement = table.update() \
+            .where(table.c.id == bindparam('_id')) \
+            .values({column: table.c[column] + bindparam('_' + column) for column in columns})
+        db.session.execute(statement, rows)
+
+
+def _count_shows(rows, upcoming, past):
+    # rows of (venue_id, artist_id, is_past), each adding upcoming/past
+    # to the counters of its venue and artist according to its flag
+    for model, position in ((Venue, 0), (Artist, 1)):
+        deltas = defaultdict(lambda: [0, 0])
+        for row in rows:
+            delta = deltas[row[position]]
+            if row[2]:
+                delta[1] += past
+            else:
+                delta[0] += upcoming
+        _bump(model, SHOW_COUNTERS, deltas)
+
+
+def shows_added(rows):
+    """(venue_id, artist_id, is_past) of the shows added to the session."""
+    _count_shows(rows, 1, 1)
+
+
+def shows_removed(rows):
+    """(venue_id, artist_id, is_past) of the shows deleted in the session."""
+    _count_shows(rows, -1, -1)
+
+
+def songs_changed(album_id, song_ids, sign):
+    """Count songs in (sign 1, after the flush) or out (sign -1, before the delete) of an album."""
+    seconds = select(func.coalesce(func.sum(time_seconds(Songs.duration)), 0)) \
+        .where(Songs.id.in_(song_ids)).scalar_subquery()
+    table = Album.__table__
+    db.session.execute(table.update()
+                       .where(table.c.id == album_id)
+                       .values(songs_count=table.c.songs_count + sign * len(song_ids),
+                               songs_seconds=table.c.songs_seconds + sign * seconds))
+
+
+def roll(now=None, batch_size=5000, on_batch=None):
+    """Flag the shows started by ``now`` as past and move them to the past counters.
+
+    Works in committed batches; ``on_batch(venue_ids, artist_ids)`` is
+    called after each one. Returns the number of shows moved.
+    """
+    now = now or datetime.now()
+    moved = 0
+    while True:
+        rows = db.session.query(Shows.show_id, Shows.venue_id, Shows.artist_id) \
+            .filter(Shows.is_past.is_(False), Shows.start_time <= now) \
+            .order_by(Shows.start_time, Shows.show_id) \
+            .limit(batch_size).with_for_update().all()
+        if not rows:
+            return moved
+
+        flagged = db.session.query(Shows) \
+            .filter(Shows.show_id.in_([row.show_id for row in rows]), Shows.is_past.is_(False)) \
+            .update({Shows.is_past: True}, synchronize_session=False)
+        if flagged != len(rows):
+            # a concurrent roll() took some of them, start the batch over
+            db.session.rollback()
+            continue
+
+        # upcoming -1 for the rows as they were, past +1 as they are now
+        _count_shows([(venue_id, artist_id, False) for _, venue_id, artist_id in rows], -1, 0)
+        _count_shows([(venue_id, artist_id, True) for _, venue_id, artist_id in rows], 0, 1)
+        db.session.commit()
+        moved += len(rows)
+        if on_batch is not None:
+            on_batch({row.venue_id for row in rows}, {row.artist_id for row in rows})
+
+
+def _show_counts(key):
+    return db.session.query(key.label('id'),
+                            func.count(case((Shows.is_past.is_(False), Shows.show_id))).label('upcoming_shows_count'),
+                            func.count(case((Shows.is_past.is_(True), Shows.show_id))).label('past_shows_count')) \
+        .group_by(key).subquery()
+
+
+def _song_counts():
+    return db.session.query(Songs.album_id.label('id'),
+                            func.count(Songs.id).label('songs_count'),
+                            func.coalesce(func.sum(time_seconds(Songs.duration)), 0).label('songs_seconds')) \
+        .group_by(Songs.album_id).subquery()
+
+
+def reconcile(fix=False, now=None, sample=5):
+    """Recount everything; {table: (rows that drifted, a few (id, stored, actual))}.
+
+    The Shows entry counts the shows whose flag disagrees with their start
+    time, e.g. after an import or while roll() is not scheduled. With
+    ``fix`` they are flagged again and the drifted counters are recounted.
+    """
+    now = now or datetime.now()
+    stale = db.or_(db.and_(Shows.is_past.is_(True), Shows.start_time > now),
+                   db.and_(Shows.is_past.is_(False), Shows.start_time <= now))
+    report = {'Shows': (db.session.query(func.count(Shows.show_id)).filter(stale).scalar(), [])}
+    if fix and report['Shows'][0]:
+        db.session.query(Shows).filter(stale) \
+            .update({Shows.is_past: Shows.start_time <= now}, synchronize_session=False)
+        db.session.commit()
+
+    for model, columns, counts in ((Venue, SHOW_COUNTERS, _show_counts(Shows.venue_id)),
+                                   (Artist, SHOW_COUNTERS, _show_counts(Shows.artist_id)),
+                                   (Album, SONG_COUNTERS, _song_counts())):
+        stored = [getattr(model, column) for column in columns]
+        actual = [func.coalesce(counts.c[column], 0) for column in columns]
+        drifted = db.session.query(model.id, *stored, *actual) \
+            .outerjoin(counts, counts.c.id == model.id) \
+            .filter(db.or_(*(left != right for left, right in zip(stored, actual)))) \
+            .order_by(model.id).all()
+        report[model.__tablename__] = (len(drifted), [
+            (row[0], row[1:1 + len(columns)], row[1 + len(columns):]) for row in drifted[:sample]])
+
+        if fix and drifted:
+            table = model.__table__
+            db.session.execute(table.update()
+                               .where(table.c.id == bindparam('_id'))
+                               .values({column: bindparam('_' + column) for column in columns}),
+                               [dict(_id=row[0], **{'_' + column: value for column, value in
+                                                    zip(columns, row[1 + len(columns):])})
+                                for row in drifted])
+            db.session.commit()
+    return report
+
+
+def install(connection):
+    """Add the counter columns and the show flag to tables created before them."""
+    present = {table: {column['name'] for column in inspect(connection).get_columns(table)}
+               for table in (Venue.__tablename__, Artist.__tablename__, Album.__tablename__,
+                             Shows.__tablename__)}
+    added = []
+    for model, columns in ((Venue, SHOW_COUNTERS), (Artist, SHOW_COUNTERS),
+                           (Album, SONG_COUNTERS), (Shows, ('is_past',))):
+        for column in columns:
+            if column not in present[model.__tablename__]:
+                ddl = CreateColumn(model.__table__.c[column]).compile(dialect=connection.dialect)
+                connection.exec_driver_sql('ALTER TABLE "{}" ADD COLUMN {}'.format(model.__tablename__, ddl))
+                added.append('{}.{}'.format(model.__tablename__, column))
+    for index in Shows.__table__.indexes:
+        if index.name == 'ix_Shows_is_past_start_time':
+            index.create(connection, checkfirst=True)
+    return added
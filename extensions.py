@@ -0,0 +1,16 @@
+# ----------------------------------------------------------------------------#
+# Extensions, bound to the app by create_app().
+# ----------------------------------------------------------------------------#
+
+from flask_migrate import Migrate
+from flask_moment import Moment
+
+from autocomplete import Autocomplete
+from cache import ResponseCache
+from routing import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
+migrate = Migrate()
+moment = Moment()
+response_cache = ResponseCache()
+autocomplete = Autocomplete()
@@ -1,14 +1,21 @@
-from fabric.api import local, settings, abort
+from fabric.api import local, settings, abort, shell_env
 from fabric.contrib.console import confirm
 
+# the smoke run: a small synthetic catalogue, every route once, then the checks
+SMOKE = (
+    "python benchmarks/generate.py --shows 1k --drop && "
+    "python benchmarks/routes_bench.py --iterations 1 --warmup 0 --output benchmarks/results/smoke.json && "
+    "python benchmarks/bulk_import_check.py && "
+    "python benchmarks/booking_race.py && "
+    "python benchmarks/replica_routing.py"
+)
+
 # prepare for deployment
 
 
 def test():
-    with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
+    with settings(warn_only=True), shell_env(DATABASE_URL='sqlite:///smoke.db', SECRET_KEY='smoke'):
+        result = local(SMOKE, capture=True)
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
@@ -39,8 +46,9 @@ def heroku():
 
 
 def heroku_test():
+    # the dyno's own database is left alone, the smoke run gets a scratch one
     local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
+        "heroku run \"DATABASE_URL=sqlite:///smoke.db SECRET_KEY=smoke {}\"".format(SMOKE)
     )
 
 
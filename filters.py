@@ -0,0 +1,101 @@
+# ----------------------------------------------------------------------------#
+# Filters.
+# ----------------------------------------------------------------------------#
+
+# babel and dateutil are imported on first use, they are slow to import
+# and not every process renders dates (e.g. the CLI).
+
+from datetime import date, datetime, time
+from functools import lru_cache
+
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+def _padded(number, width):
+    return str(number).zfill(width)
+
+
+def _compile_field(char, num, locale):
+    import babel.dates
+
+    # formatter of one pattern field, with the locale names looked up once
+    if char == 'E':
+        names = locale.days['format'][{4: 'wide', 5: 'narrow', 6: 'short'}.get(num, 'abbreviated')]
+        return lambda value: names[value.weekday()]
+    if char == 'M':
+        if num <= 2:
+            return lambda value: _padded(value.month, num)
+        names = locale.months['format'][{3: 'abbreviated', 5: 'narrow'}.get(num, 'wide')]
+        return lambda value: names[value.month]
+    if char == 'y':
+        if num == 2:
+            return lambda value: _padded(value.year % 100, 2)
+        return lambda value: _padded(value.year, num)
+    if char == 'd':
+        return lambda value: _padded(value.day, num)
+    if char == 'h':
+        return lambda value: _padded(value.hour % 12 or 12, num)
+    if char == 'H':
+        return lambda value: _padded(value.hour, num)
+    if char == 'm':
+        return lambda value: _padded(value.minute, num)
+    if char == 's':
+        return lambda value: _padded(value.second, num)
+    if char == 'a':
+        for width in ('wide', 'narrow', 'abbreviated'):
+            periods = babel.dates.get_period_names(context='format', width=width, locale=locale)
+            if 'am' in periods and 'pm' in periods:
+                return lambda value: periods['pm'] if value.hour >= 12 else periods['am']
+    # anything else goes through babel itself
+    field = char * num
+    return lambda value: babel.dates.DateTimeFormat(value, locale)[field]
+
+
+@lru_cache(maxsize=64)
+def datetime_formatter(format, locale):
+    """Compile a 'full'/'medium'/babel pattern for a locale into a function.
+
+    babel.dates.format_datetime re-parses the pattern and looks up the
+    locale names on every call, this does it once.
+    """
+    import babel.dates
+
+    locale = babel.Locale.parse(locale)
+    parts = []
+    for kind, token in babel.dates.tokenize_pattern(DATETIME_FORMATS.get(format, format)):
+        if kind == 'chars':
+            parts.append(lambda value, text=token: text)
+        else:
+            parts.append(_compile_field(token[0], token[1], locale))
+    return lambda value: ''.join([part(value) for part in parts])
+
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time())
+    # added this because of data formatting:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        import dateutil.parser
+        return dateutil.parser.parse(value)
+
+
+def format_datetime(value, format='medium', locale='en'):
+    return datetime_formatter(format, locale)(to_datetime(value))
+
+
+def format_datetimes(values, format='medium', locale='en'):
+    """Format a whole column of timestamps, repeated values are formatted once."""
+    formatter = datetime_formatter(format, locale)
+    formatted = {}
+    for value in values:
+        if value not in formatted:
+            formatted[value] = formatter(to_datetime(value))
+    return [formatted[value] for value in values]
@@ -1,18 +1,54 @@
 from datetime import datetime
+from flask import url_for
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, TimeField
 from wtforms.validators import DataRequired, AnyOf, URL, Optional, InputRequired
 from wtforms.fields.html5 import DateField
 
+from models import Venue, Artist
+
+
+class LookupField(SelectField):
+    """A venue or artist <select> whose options are fetched from /lookup as the user types.
+
+    Only the selected option is rendered, and validation looks up the
+    submitted id alone instead of building the list of every choice.
+    """
+
+    def __init__(self, label=None, validators=None, model=None, entity=None, **kwargs):
+        kwargs.setdefault('coerce', int)
+        super(LookupField, self).__init__(label, validators, choices=[], **kwargs)
+        self.model = model
+        self.entity = entity
+
+    def __call__(self, **kwargs):
+        kwargs.setdefault('data-lookup-url', url_for('main.lookup', entity=self.entity))
+        return super(LookupField, self).__call__(**kwargs)
+
+    def iter_choices(self):
+        if self.data is not None:
+            name = self.model.query.with_entities(self.model.name).filter_by(id=self.data).scalar()
+            if name is not None:
+                yield self.data, name, True
+
+    def pre_validate(self, form):
+        if self.data is None or self.model.query.with_entities(self.model.id) \
+                .filter_by(id=self.data).first() is None:
+            raise ValueError(self.gettext('Not a valid choice'))
+
 
 class ShowForm(Form):
-    artist_id = SelectField(
+    artist_id = LookupField(
         'artist_id',
         validators=[DataRequired()],
+        model=Artist,
+        entity='artists',
     )
-    venue_id = SelectField(
+    venue_id = LookupField(
         'venue_id',
         validators=[DataRequired()],
+        model=Venue,
+        entity='venues',
     )
     start_time = DateTimeField(
         'start_time',
@@ -258,10 +294,11 @@ class AlbumForm(Form):
         validators=[DataRequired()],
         default=datetime.today()
     )
-    artist = SelectField(
+    artist = LookupField(
         'artist',
-        coerce=int,
-        validators=[DataRequired()]
+        validators=[DataRequired()],
+        model=Artist,
+        entity='artists',
     )
 
 
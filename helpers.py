@@ -0,0 +1,186 @@
+# ----------------------------------------------------------------------------#
+# Helpers.
+# ----------------------------------------------------------------------------#
+
+import base64
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import inspect, or_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.sql.expression import FunctionElement
+
+import booking
+from extensions import db
+from models import Genre, Venue, Artist, Shows, Album
+
+
+class time_seconds(FunctionElement):
+    # number of seconds in a TIME column, e.g. to add up song durations
+    type = db.Integer()
+    name = 'time_seconds'
+    inherit_cache = True
+
+
+@compiles(time_seconds)
+def compile_time_seconds(element, compiler, **kw):
+    return 'EXTRACT(EPOCH FROM {})'.format(compiler.process(element.clauses, **kw))
+
+
+@compiles(time_seconds, 'sqlite')
+def compile_time_seconds_sqlite(element, compiler, **kw):
+    # sqlite stores TIME as 'HH:MM:SS.ffffff' text
+    column = compiler.process(element.clauses, **kw)
+    return '(CAST(substr({0}, 1, 2) AS INTEGER) * 3600 + ' \
+           'CAST(substr({0}, 4, 2) AS INTEGER) * 60 + ' \
+           'CAST(substr({0}, 7, 2) AS INTEGER))'.format(column)
+
+
+def encode_cursor(start_time, show_id):
+    # opaque keyset cursor for the (start_time, show_id) sort order
+    raw = '{}|{}'.format(start_time.isoformat(), show_id)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        start_time, show_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(start_time), int(show_id)
+    except ValueError:
+        return None
+
+
+def encode_name_cursor(name, id):
+    # opaque keyset cursor for the (name, id) sort order
+    raw = '{}|{}'.format(id, name)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_name_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        id, name = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        return name, int(id)
+    except ValueError:
+        return None
+
+
+def get_genres(names):
+    # Genre rows for the submitted names, the missing ones are added to the session
+    names = sorted({name.strip() for name in names if name.strip()})
+    if not names:
+        return []
+    genres = Genre.query.filter(Genre.name.in_(names)).all()
+    known = {genre.name for genre in genres}
+    for name in names:
+        if name not in known:
+            genre = Genre(name=name)
+            db.session.add(genre)
+            genres.append(genre)
+    return genres
+
+
+def show_conflict(artist_id, venue_id, start_time):
+    # whether the artist or the venue already has a show overlapping the slot,
+    # the database constraints from booking.py have the final word on commit
+    return db.session.query(
+        Shows.query.filter(or_(Shows.artist_id == artist_id, Shows.venue_id == venue_id))
+        .filter(Shows.start_time > start_time - booking.SHOW_SLOT)
+        .filter(Shows.start_time < start_time + booking.SHOW_SLOT)
+        .exists()
+    ).scalar()
+
+
+def touch(model, ids):
+    # bump updated_at of pages whose content changed through a related row
+    ids = {id for id in ids if id is not None}
+    if ids:
+        model.query.filter(model.id.in_(ids)) \
+            .update({model.updated_at: datetime.utcnow()}, synchronize_session=False)
+
+
+def install_updated_at(connection):
+    # add updated_at to tables created before it, the existing rows get the
+    # current time, so their first ETag/Last-Modified is the install time
+    added = []
+    for model in (Venue, Artist, Shows, Album):
+        table = model.__table__
+        if 'updated_at' not in {column['name'] for column in inspect(connection).get_columns(table.name)}:
+            ddl = CreateColumn(table.c.updated_at).compile(dialect=connection.dialect)
+            connection.exec_driver_sql('ALTER TABLE "{}" ADD COLUMN {}'.format(table.name, ddl))
+            added.append(table.name)
+        connection.execute(table.update().where(table.c.updated_at.is_(None))
+                           .values(updated_at=datetime.utcnow()))
+    return added
+
+
+def played_at(venue_id):
+    return db.session.query(Shows.artist_id).filter(Shows.venue_id == venue_id)
+
+
+def played_by(artist_id):
+    return db.session.query(Shows.venue_id).filter(Shows.artist_id == artist_id)
+
+
+def venue_version(venue_id):
+    # the page changes on edits (updated_at) and when an upcoming show becomes a past one
+    return db.session.query(Venue.updated_at, Venue.upcoming_shows_count) \
+        .filter(Venue.id == venue_id).first()
+
+
+def artist_version(artist_id):
+    return db.session.query(Artist.updated_at, Artist.upcoming_shows_count) \
+        .filter(Artist.id == artist_id).first()
+
+
+def album_version(album_id):
+    return db.session.query(Album.updated_at, Album.id).filter(Album.id == album_id).first()
+
+
+def per_page_arg(default, maximum=100):
+    # ?per_page within 1..maximum; without it the configured default,
+    # where 0 turns the pagination of the area/artist listings off
+    per_page = request.args.get('per_page', type=int)
+    if per_page is None:
+        return default
+    return max(1, min(per_page, maximum))
+
+
+def show_limits():
+    # how many upcoming/past shows a detail page lists, raised by "load more"
+    default = current_app.config.get('DETAIL_SHOWS_LIMIT', 12)
+    return {
+        'step': default,
+        'upcoming': max(request.args.get('upcoming', default, type=int), 0),
+        'past': max(request.args.get('past', default, type=int), 0),
+    }
+
+
+def entity_shows(condition, related, related_key, prefix, limits):
+    # the capped upcoming and past shows of a venue/artist with the columns
+    # of the related artist/venue, returned as the dicts the templates use;
+    # split by Shows.is_past like the counters of counters.py
+    query = db.session.query(related.id, related.name, related.image_link, Shows.start_time) \
+        .join(related, related.id == related_key) \
+        .filter(condition)
+
+    upcoming = query.filter(Shows.is_past.is_(False)) \
+        .order_by(Shows.start_time, Shows.show_id) \
+        .limit(limits['upcoming']).all()
+    past = query.filter(Shows.is_past.is_(True)) \
+        .order_by(Shows.start_time.desc(), Shows.show_id.desc()) \
+        .limit(limits['past']).all()
+
+    def as_dict(row):
+        return {
+            prefix + '_id': row.id,
+            prefix + '_name': row.name,
+            prefix + '_image_link': row.image_link,
+            'start_time': row.start_time
+        }
+
+    return [as_dict(row) for row in upcoming], [as_dict(row) for row in past]
@@ -0,0 +1,158 @@
+# ----------------------------------------------------------------------------#
+# Per-request SQL instrumentation.
+#
+# Every statement run by any engine while a request is being handled is
+# timed and recorded on flask.g. When the response goes out the totals are
+# reported as a Server-Timing header, one structured log line and,
+# optionally, a debug panel appended to HTML pages.
+#
+# Statements are also grouped by shape (literals and IN-lists collapsed),
+# so a loop issuing the same query once per row shows up as one shape run
+# many times: past SQL_NPLUS1_THRESHOLD the request is reported as an N+1,
+# which raises NPlusOneError while testing and logs a warning otherwise.
+# ----------------------------------------------------------------------------#
+
+import heapq
+import json
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from markupsafe import escape
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('fyyur.sql')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)|\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def normalize(statement):
+    """Reduce a statement to its shape: same query, whatever the values."""
+    shape = _LITERALS.sub('?', statement)
+    shape = _IN_LISTS.sub('(?)', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+class RequestQueries(object):
+    """The statements run by one request."""
+
+    def __init__(self, slowest=5):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.slowest = []
+        self.keep = slowest
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[normalize(statement)] += 1
+        entry = (duration, self.count, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def repeated(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def summary(self, threshold):
+        return {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'queries': self.count,
+            'db_ms': round(self.duration * 1000, 2),
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'slowest': [{'ms': round(duration * 1000, 2), 'sql': statement}
+                        for duration, _, statement in sorted(self.slowest, reverse=True)],
+            'repeated': [{'count': count, 'sql': shape} for shape, count in self.repeated(threshold)],
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_queries' in g:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if started and has_request_context() and 'sql_queries' in g:
+        g.sql_queries.record(statement, time.perf_counter() - started.pop())
+
+
+class QueryInspector(object):
+
+    def __init__(self, app=None):
+        self.threshold = 10
+        self.slowest = 5
+        self.panel = False
+        self.fail = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('SQL_INSTRUMENT', True):
+            return
+        self.threshold = app.config.get('SQL_NPLUS1_THRESHOLD', 10)
+        self.slowest = app.config.get('SQL_SLOW_QUERIES', 5)
+        self.panel = app.config.get('SQL_DEBUG_PANEL', False)
+        fail = app.config.get('SQL_NPLUS1_RAISE')
+        self.fail = app.testing if fail is None else fail
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['query_inspector'] = self
+
+    def _start(self):
+        g.sql_queries = RequestQueries(self.slowest)
+
+    def _finish(self, response):
+        queries = g.pop('sql_queries', None)
+        if queries is None:
+            return response
+        summary = queries.summary(self.threshold)
+
+        response.headers.add('Server-Timing', 'db;dur={};desc="{} queries"'.format(summary['db_ms'], summary['queries']))
+        response.headers.add('Server-Timing', 'app;dur={}'.format(summary['total_ms']))
+        logger.info(json.dumps(summary))
+
+        if summary['repeated']:
+            message = '{} {}: possible N+1, {}'.format(
+                request.method, request.path,
+                '; '.join('{count}x {sql}'.format(**shape) for shape in summary['repeated']))
+            if self.fail:
+                raise NPlusOneError(message)
+            logger.warning(message)
+
+        if self.panel and response.mimetype == 'text/html' and not response.is_streamed \
+                and not response.direct_passthrough:
+            body = response.get_data(as_text=True)
+            panel = self.render_panel(summary)
+            index = body.rfind('</body>')
+            response.set_data(body[:index] + panel + body[index:] if index >= 0 else body + panel)
+        return response
+
+    def render_panel(self, summary):
+        rows = ''.join('<tr><td>{}</td><td><code>{}</code></td></tr>'.format(item['ms'], escape(item['sql']))
+                       for item in summary['slowest'])
+        repeated = ''.join('<tr><td>{}x</td><td><code>{}</code></td></tr>'.format(item['count'], escape(item['sql']))
+                           for item in summary['repeated'])
+        return ('<div id="sql-panel" class="container"><h4>SQL: {queries} queries, {db_ms} ms '
+                '(request {total_ms} ms)</h4><table class="table table-condensed">'
+                '<tr><th>ms</th><th>slowest statements</th></tr>{rows}{shapes}</table></div>'
+                ).format(rows=rows, shapes=repeated and '<tr><th></th><th>repeated</th></tr>' + repeated,
+                         queries=summary['queries'], db_ms=summary['db_ms'], total_ms=summary['total_ms'])
@@ -0,0 +1,257 @@
+# ----------------------------------------------------------------------------#
+# Prometheus metrics.
+#
+# Request latency (per route, method and status), template render time,
+# database pool usage and cache hit rates, served in the Prometheus text
+# format on /metrics.
+#
+# Observations are counted in per-thread shards, so recording one never
+# takes a lock; the shards are only summed when /metrics is scraped. The
+# shard of a thread that exits is folded into a shared total, so servers
+# running a thread per request keep a bounded number of them.
+#
+# Under gunicorn every worker counts on its own. Set METRICS_MULTIPROC_DIR
+# (or PROMETHEUS_MULTIPROC_DIR) to a directory shared by the workers: each
+# one then writes its snapshot there every METRICS_FLUSH_INTERVAL seconds
+# and /metrics adds up the snapshots of every worker, whichever answers.
+# ----------------------------------------------------------------------------#
+
+import glob
+import json
+import os
+import itertools
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from flask import Response, g, request
+from flask.signals import before_render_template, template_rendered, signals_available
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+RENDER_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _labels(**labels):
+    return ','.join('{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+                    for name, value in sorted(labels.items()))
+
+
+class _Shard(object):
+    # held by the thread-local only, so it goes away with its thread
+
+    __slots__ = ('series', '__weakref__')
+
+    def __init__(self):
+        self.series = {}
+
+
+class Histogram(object):
+    """A Prometheus histogram whose observations go to per-thread shards."""
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = {}
+        self._keys = itertools.count()
+        # reentrant: a shard can be retired by a collection in the middle of snapshot()
+        self._lock = threading.RLock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            key = next(self._keys)
+            with self._lock:
+                self._shards[key] = shard.series
+            weakref.finalize(shard, self._retire, key)
+        return shard.series
+
+    def _retire(self, key):
+        # the thread is gone, nothing writes to its shard any more
+        with self._lock:
+            for labels, series in self._shards.pop(key, {}).items():
+                _add(self._retired.setdefault(labels, [0] * len(series)), series)
+
+    def observe(self, labels, value):
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            # one count per bucket, then +Inf and the sum
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            shards = list(self._shards.values())
+            total = {labels: list(series) for labels, series in self._retired.items()}
+        for shard in shards:
+            for labels, series in list(shard.items()):
+                _add(total.setdefault(labels, [0] * len(series)), series)
+        return total
+
+    def render(self, snapshot):
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} histogram'.format(self.name)]
+        for labels, series in sorted(snapshot.items()):
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append('{}_bucket{{{}le="{}"}} {}'.format(self.name, prefix, bound, cumulative))
+            braced = '{' + labels + '}' if labels else ''
+            lines.append('{}_sum{} {}'.format(self.name, braced, series[-1]))
+            lines.append('{}_count{} {}'.format(self.name, braced, cumulative))
+        return lines
+
+
+def _add(total, series):
+    for index, value in enumerate(series):
+        total[index] += value
+
+
+class Metrics(object):
+
+    def __init__(self, app=None, db=None, caches=None):
+        self.requests = Histogram('fyyur_request_duration_seconds',
+                                  'Time spent answering requests.', LATENCY_BUCKETS)
+        self.renders = Histogram('fyyur_template_render_seconds',
+                                 'Time spent rendering templates.', RENDER_BUCKETS)
+        self.db = db
+        self.caches = caches or {}
+        self.directory = None
+        self.interval = 5
+        self._flushed = 0.0
+        self._renders = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = (app.config.get('METRICS_MULTIPROC_DIR') or
+                          os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+        self.interval = app.config.get('METRICS_FLUSH_INTERVAL', 5)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        if signals_available:
+            before_render_template.connect(self._render_started, app, weak=False)
+            template_rendered.connect(self._render_finished, app, weak=False)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        app.extensions['metrics'] = self
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+
+    def _finish(self, response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            # label by the route pattern, not the path, to keep the series bounded
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            self.requests.observe(_labels(route=route, method=request.method, status=response.status_code),
+                                  time.perf_counter() - started)
+        if self.directory and time.monotonic() - self._flushed > self.interval:
+            self._flushed = time.monotonic()
+            self.flush()
+        return response
+
+    def _render_started(self, sender, template, context, **extra):
+        self._renders.started = time.perf_counter()
+
+    def _render_finished(self, sender, template, context, **extra):
+        started = getattr(self._renders, 'started', None)
+        if started is not None:
+            self.renders.observe(_labels(template=template.name), time.perf_counter() - started)
+            self._renders.started = None
+
+    def gauges(self):
+        values = {}
+        pool = self.db.engine.pool if self.db is not None else None
+        for name, method in (('size', 'size'), ('checked_out', 'checkedout'),
+                             ('checked_in', 'checkedin'), ('overflow', 'overflow')):
+            if pool is not None and hasattr(pool, method):
+                values['fyyur_db_pool_' + name] = {'': getattr(pool, method)()}
+        return values
+
+    def counters(self):
+        values = {}
+        for cache, source in self.caches.items():
+            stats = source.stats()
+            for kind in ('hits', 'misses'):
+                values.setdefault('fyyur_cache_{}_total'.format(kind), {})[_labels(cache=cache)] = stats[kind]
+        return values
+
+    def snapshot(self):
+        return {
+            'pid': os.getpid(),
+            'histograms': {self.requests.name: self.requests.snapshot(), self.renders.name: self.renders.snapshot()},
+            'counters': self.counters(),
+            'gauges': self.gauges(),
+        }
+
+    def flush(self):
+        path = os.path.join(self.directory, 'metrics-{}.json'.format(os.getpid()))
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        """Add up this process' snapshot and the ones other workers wrote."""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                try:
+                    with open(path) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if snapshot['pid'] == os.getpid():
+                    continue
+                if not _alive(snapshot['pid']):
+                    # a dead worker's requests still count, its pool does not
+                    snapshot['gauges'] = {}
+                snapshots.append(snapshot)
+
+        total = {'histograms': {}, 'counters': {}, 'gauges': {}}
+        for snapshot in snapshots:
+            for name, series in snapshot['histograms'].items():
+                merged = total['histograms'].setdefault(name, {})
+                for labels, values in series.items():
+                    _add(merged.setdefault(labels, [0] * len(values)), values)
+            for kind in ('counters', 'gauges'):
+                for name, series in snapshot[kind].items():
+                    merged = total[kind].setdefault(name, {})
+                    for labels, value in series.items():
+                        merged[labels] = merged.get(labels, 0) + value
+        return total
+
+    def render(self):
+        total = self.collect()
+        lines = []
+        for histogram in (self.requests, self.renders):
+            lines.extend(histogram.render(total['histograms'].get(histogram.name, {})))
+        for kind, type in (('counters', 'counter'), ('gauges', 'gauge')):
+            for name, series in sorted(total[kind].items()):
+                lines.append('# TYPE {} {}'.format(name, type))
+                for labels, value in sorted(series.items()):
+                    lines.append('{}{} {}'.format(name, '{' + labels + '}' if labels else '', value))
+        return '\n'.join(lines) + '\n'
+
+    def view(self):
+        return Response(self.render(), content_type=CONTENT_TYPE)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,176 @@
+# ----------------------------------------------------------------------------#
+# Models.
+# ----------------------------------------------------------------------------#
+
+from datetime import datetime
+
+import booking
+import search
+from extensions import db
+
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False, unique=True)
+
+    def __repr__(self):
+        return '<Genre {}, {}>'.format(self.id, self.name)
+
+
+# the primary keys serve lookups by entity, the second index lookups by genre
+VenueGenres = db.Table('VenueGenres',
+                       db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True),
+                       db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+                       db.Index('ix_VenueGenres_genre_id_venue_id', 'genre_id', 'venue_id'))
+
+ArtistGenres = db.Table('ArtistGenres',
+                        db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True),
+                        db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+                        db.Index('ix_ArtistGenres_genre_id_artist_id', 'genre_id', 'artist_id'))
+
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # index: the name-ordered pages of /lookup
+    name = db.Column(db.String, index=True)
+    city = db.Column(db.String(128), index=True)
+    state = db.Column(db.String(128), index=True)
+    address = db.Column(db.String(128))
+    phone = db.Column(db.String(128))
+    genres = db.Column(db.String())
+    image_link = db.Column(db.String(512))
+    facebook_link = db.Column(db.String(128))
+    website_link = db.Column(db.String(128))
+    seeking_talent = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String(255))
+    listed_on = db.Column(db.Date, default=datetime.now())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # kept by counters.py, recounted by 'flask counters reconcile'
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    artists = db.relationship('Artist',
+                              secondary='Shows',
+                              backref=db.backref('artists', lazy=True))
+    genre_list = db.relationship('Genre', secondary=VenueGenres, lazy=True,
+                                 order_by='Genre.name')
+
+    __table_args__ = (
+        # the name prefix filter of /lookup: lower(name) LIKE 'prefix%'
+        db.Index('ix_Venue_name_lower', db.func.lower(name).label('name_lower'),
+                 postgresql_ops={'name_lower': 'text_pattern_ops'}),
+    )
+
+    def __repr__(self):
+        return '<Venue {}, {}>'.format(self.id, self.name)
+
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # index: the name-ordered pages of /lookup
+    name = db.Column(db.String, index=True)
+    city = db.Column(db.String(128), index=True)
+    state = db.Column(db.String(128), index=True)
+    phone = db.Column(db.String(128))
+    genres = db.Column(db.String())
+    image_link = db.Column(db.String(512))
+    facebook_link = db.Column(db.String(128))
+    website_link = db.Column(db.String(128))
+    seeking_venue = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String(255))
+    listed_on = db.Column(db.Date, default=datetime.now())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # kept by counters.py, recounted by 'flask counters reconcile'
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    album = db.relationship('Album',
+                            backref=db.backref('album', lazy=True))
+    genre_list = db.relationship('Genre', secondary=ArtistGenres, lazy=True,
+                                 order_by='Genre.name')
+
+    __table_args__ = (
+        # the name prefix filter of /lookup: lower(name) LIKE 'prefix%'
+        db.Index('ix_Artist_name_lower', db.func.lower(name).label('name_lower'),
+                 postgresql_ops={'name_lower': 'text_pattern_ops'}),
+    )
+
+    def __repr__(self):
+        return '<Artist {}, {}>'.format(self.id, self.name)
+
+
+class Shows(db.Model):
+    __tablename__ = 'Shows'
+
+    show_id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'))
+    start_time = db.Column(db.DateTime, default=datetime.now())
+    # set once start_time has passed, by the write handlers or counters.roll()
+    is_past = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # keyset pagination on /shows walks the first index,
+    # per venue/artist listings and booking conflict checks the next two,
+    # counters.roll() the last one
+    __table_args__ = (
+        db.Index('ix_Shows_start_time_show_id', 'start_time', 'show_id'),
+        db.Index('ix_Shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Shows_is_past_start_time', 'is_past', 'start_time'),
+    )
+
+    def __repr__(self):
+        return '<Show id: {}, Venue id: {}, Artist id: {}>'.format(self.show_id, self.venue_id, self.artist_id)
+
+
+class Album(db.Model):
+    __tablename__ = 'Album'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(128), nullable=False)
+    description = db.Column(db.String(255), nullable=True)
+    launch_date = db.Column(db.Date, default=datetime.now())
+    image_cover = db.Column(db.String())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'),
+                          nullable=False, index=True)
+    # kept by counters.py, recounted by 'flask counters reconcile'
+    songs_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    songs_seconds = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    songs = db.relationship('Songs', backref='songs', lazy=True)
+
+    def __repr__(self):
+        return '<Album: {}, {}>'.format(self.id, self.name)
+
+
+class Songs(db.Model):
+    __tablename__ = 'Songs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(128))
+    duration = db.Column(db.Time)
+    album_id = db.Column(db.Integer, db.ForeignKey('Album.id'),
+                         nullable=False, index=True)
+
+    def __repr__(self):
+        return '<Song: {}, {}>'.format(self.id, self.name)
+
+
+search.register(Venue)
+search.register(Artist)
+booking.register(Shows)
+
+
+# models that the bulk commands and export endpoints work on
+BULK_MODELS = {
+    'venues': Venue,
+    'artists': Artist,
+    'albums': Album,
+    'songs': Songs,
+    'shows': Shows,
+}
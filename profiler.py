@@ -0,0 +1,227 @@
+# ----------------------------------------------------------------------------#
+# On-demand request profiling.
+#
+# A request is profiled when it carries "X-Profile: <PROFILE_TOKEN>", or at
+# random for a PROFILE_SAMPLE_RATE share of the traffic. PROFILE_MODE picks
+# the profiler: 'cprofile' (exact call counts, saved as .pstats for
+# pstats/snakeviz) or 'sample' (a thread snapshotting the request's stack
+# every PROFILE_INTERVAL seconds, saved as collapsed stacks for
+# flamegraph.pl/speedscope; far cheaper on slow requests).
+#
+# Profiles go to PROFILE_DIR, which keeps the PROFILE_KEEP latest ones, and
+# are listed on /admin/profiles.
+# ----------------------------------------------------------------------------#
+
+import cProfile
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import abort, current_app, render_template, request, send_from_directory
+
+
+class StackSampler(object):
+    """Samples the stack of one thread from a background thread."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._ident = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._ident)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename),
+                                                 code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write('{} {}\n'.format(stack, count))
+
+
+class ProfileStore(object):
+    """A bounded ring of profiles on disk, each with a .json description."""
+
+    def __init__(self, directory, keep=50):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def add(self, meta, write):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            name = '{:.6f}-{}'.format(time.time(), os.getpid()).replace('.', '')
+            meta['file'] = name + meta['ext']
+            write(os.path.join(self.directory, meta['file']))
+            with open(os.path.join(self.directory, name + '.json'), 'w') as f:
+                json.dump(meta, f)
+            for old in self.list()[self.keep:]:
+                for filename in (old['name'] + '.json', old['file']):
+                    try:
+                        os.remove(os.path.join(self.directory, filename))
+                    except OSError:
+                        pass
+
+    def list(self):
+        """Descriptions of the stored profiles, newest first."""
+        profiles = []
+        if not os.path.isdir(self.directory):
+            return profiles
+        for filename in sorted(os.listdir(self.directory), reverse=True):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            meta['name'] = filename[:-len('.json')]
+            profiles.append(meta)
+        return profiles
+
+
+class ProfiledBody(object):
+    """The app's response iterable, profiled until the server closes it."""
+
+    def __init__(self, body, finish):
+        self.body = body
+        self._finish = finish
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            finish, self._finish = self._finish, None
+            if finish is not None:
+                finish()
+
+
+class Profiler(object):
+    """WSGI middleware profiling the requests that ask for it."""
+
+    def __init__(self, app=None):
+        self.wsgi_app = None
+        self.token = None
+        self.rate = 0.0
+        self.mode = 'cprofile'
+        self.interval = 0.005
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.token = app.config.get('PROFILE_TOKEN')
+        self.rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+        self.mode = app.config.get('PROFILE_MODE', 'cprofile')
+        self.interval = app.config.get('PROFILE_INTERVAL', 0.005)
+        self.store = ProfileStore(app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles'),
+                                  app.config.get('PROFILE_KEEP', 50))
+
+        self.wsgi_app = app.wsgi_app
+        app.wsgi_app = self
+        app.add_url_rule('/admin/profiles', 'profiles', self.index)
+        app.add_url_rule('/admin/profiles/<path:filename>', 'profile_download', self.download)
+        app.extensions['profiler'] = self
+
+    def _authorized(self, value):
+        # compared as bytes: compare_digest() refuses non-ASCII strings, and
+        # WSGI header values are latin-1 decoded bytes
+        if not (self.token and value):
+            return False
+        try:
+            value = value.encode('latin-1')
+        except UnicodeEncodeError:
+            return False
+        return hmac.compare_digest(value, self.token.encode())
+
+    def wants(self, environ):
+        if self._authorized(environ.get('HTTP_X_PROFILE')):
+            return True
+        return self.rate > 0 and random.random() < self.rate
+
+    def __call__(self, environ, start_response):
+        if not self.wants(environ):
+            return self.wsgi_app(environ, start_response)
+
+        status = []
+
+        def capture_status(code, headers, exc_info=None):
+            status.append(code)
+            return start_response(code, headers, exc_info)
+
+        if self.mode == 'sample':
+            profiler, ext = StackSampler(self.interval), '.collapsed'
+            profiler.start()
+        else:
+            profiler, ext = cProfile.Profile(), '.pstats'
+            profiler.enable()
+        started = time.perf_counter()
+
+        def finish():
+            duration = time.perf_counter() - started
+            if self.mode == 'sample':
+                profiler.stop()
+                write = profiler.dump
+            else:
+                profiler.disable()
+                write = profiler.dump_stats
+            self.store.add({
+                'method': environ.get('REQUEST_METHOD'),
+                'path': environ.get('PATH_INFO'),
+                'query': environ.get('QUERY_STRING', ''),
+                'status': status[0] if status else None,
+                'ms': round(duration * 1000, 2),
+                'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'mode': self.mode,
+                'ext': ext,
+            }, write)
+
+        try:
+            body = self.wsgi_app(environ, capture_status)
+        except Exception:
+            finish()
+            raise
+        # streamed bodies do their work as the server reads them
+        return ProfiledBody(body, finish)
+
+    def _check(self):
+        # without a token the profiles are only shown in debug mode
+        if self.token:
+            header = request.headers.get('Authorization', '')
+            if not self._authorized(header[len('Bearer '):] if header.startswith('Bearer ') else None):
+                abort(401)
+        elif not current_app.debug:
+            abort(404)
+
+    def index(self):
+        self._check()
+        return render_template('pages/profiles.html', profiles=self.store.list())
+
+    def download(self, filename):
+        self._check()
+        return send_from_directory(self.store.directory, filename, as_attachment=True)
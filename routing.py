@@ -0,0 +1,116 @@
+# ----------------------------------------------------------------------------#
+# Connection pools and read replicas.
+#
+# RoutingSQLAlchemy sizes the pools from the DB_POOL_* settings and sends
+# the reads of views marked with @replica to one of the
+# SQLALCHEMY_REPLICA_URIS, picked at random per request. Everything else,
+# and any flush or UPDATE/DELETE/INSERT statement, goes to the primary.
+#
+# Read-your-writes: once a request has written, its client reads from the
+# primary for DB_READ_YOUR_WRITES seconds (tracked in the session cookie),
+# long enough for the replicas to catch up with what it just saved.
+# ----------------------------------------------------------------------------#
+
+import random
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.engine.url import make_url
+
+
+def pool_options(config, url):
+    """create_engine() pool arguments for a database URL."""
+    if url.get_backend_name() == 'sqlite':
+        # one file, no server: the default pools are the right ones
+        return {}
+    return {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+    }
+
+
+def replica(view):
+    """Let the GET requests of a view read from a replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_replica = request.method in ('GET', 'HEAD') and \
+            session.get('db_primary_until', 0) < time.time()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        if (self._flushing or getattr(clause, 'is_dml', False) or
+                not has_request_context() or not g.get('db_replica')):
+            return super(RoutingSession, self).get_bind(mapper, clause)
+        engine = g.get('db_replica_engine')
+        if engine is None:
+            replicas = get_state(self.app).db.get_replicas(self.app)
+            if not replicas:
+                return super(RoutingSession, self).get_bind(mapper, clause)
+            # one replica per request, so its reads see one snapshot
+            engine = g.db_replica_engine = random.choice(replicas)
+        return engine
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _wrote(session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _executed(orm_execute_state):
+    if has_request_context() and (orm_execute_state.is_update or orm_execute_state.is_delete or
+                                  orm_execute_state.is_insert):
+        g.db_wrote = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def __init__(self, *args, **kwargs):
+        super(RoutingSQLAlchemy, self).__init__(*args, **kwargs)
+        self._replicas_lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('DB_READ_YOUR_WRITES', 10)
+        super(RoutingSQLAlchemy, self).init_app(app)
+
+        @app.after_request
+        def read_your_writes(response):
+            if g.get('db_wrote'):
+                session['db_primary_until'] = time.time() + app.config['DB_READ_YOUR_WRITES']
+            return response
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        # SQLALCHEMY_ENGINE_OPTIONS win over the DB_POOL_* settings
+        options = dict(pool_options(app.config, sa_url), **options)
+        return super(RoutingSQLAlchemy, self).apply_driver_hacks(app, sa_url, options)
+
+    def get_replicas(self, app):
+        """The replica engines of an app, created on first use."""
+        replicas = app.extensions.get('db_replicas')
+        if replicas is None:
+            with self._replicas_lock:
+                replicas = app.extensions.get('db_replicas')
+                if replicas is None:
+                    replicas = []
+                    for uri in app.config['SQLALCHEMY_REPLICA_URIS']:
+                        sa_url, options = self.apply_driver_hacks(
+                            app, make_url(uri), dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})))
+                        replicas.append(self.create_engine(sa_url, options))
+                    app.extensions['db_replicas'] = replicas
+        return replicas
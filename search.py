@@ -0,0 +1,150 @@
+# ----------------------------------------------------------------------------#
+# Indexed search for venues and artists.
+#
+# PostgreSQL: a pg_trgm GIN index backs substring matching and a tsvector
+# GIN index backs word matching, results are ranked by similarity/ts_rank.
+# SQLite: an external-content FTS5 table kept in sync by triggers, ranked
+# with bm25. Any other database falls back to the plain ILIKE scan.
+# ----------------------------------------------------------------------------#
+
+import re
+
+from sqlalchemy import DDL, event, func, literal_column, text, or_
+from sqlalchemy.sql import table, column
+
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+
+
+def _document(table_name):
+    # the exact same expression is used by the indexes and the queries
+    return " || ' ' || ".join("coalesce(\"{}\".{}, '')".format(table_name, name)
+                              for name in SEARCH_COLUMNS)
+
+
+def _tsvector(table_name):
+    return "to_tsvector('simple'::regconfig, {})".format(_document(table_name))
+
+
+def _postgres_ddl(table_name):
+    return [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE INDEX IF NOT EXISTS "ix_{0}_search_trgm" ON "{0}" '
+        'USING gin (({1}) gin_trgm_ops)'.format(table_name, _document(table_name)),
+        'CREATE INDEX IF NOT EXISTS "ix_{0}_search_tsv" ON "{0}" '
+        'USING gin ({1})'.format(table_name, _tsvector(table_name)),
+    ]
+
+
+def _sqlite_ddl(table_name):
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join('new.' + name for name in SEARCH_COLUMNS)
+    old_values = ', '.join('old.' + name for name in SEARCH_COLUMNS)
+    fts = table_name + '_fts'
+    return [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS "{0}" USING fts5({1}, '
+        "content='{2}', content_rowid='id')".format(fts, columns, table_name),
+        'CREATE TRIGGER IF NOT EXISTS "{0}_ai" AFTER INSERT ON "{1}" BEGIN '
+        'INSERT INTO "{0}"(rowid, {2}) VALUES (new.id, {3}); END'
+        .format(fts, table_name, columns, new_values),
+        'CREATE TRIGGER IF NOT EXISTS "{0}_ad" AFTER DELETE ON "{1}" BEGIN '
+        'INSERT INTO "{0}"("{0}", rowid, {2}) VALUES (\'delete\', old.id, {3}); END'
+        .format(fts, table_name, columns, old_values),
+        'CREATE TRIGGER IF NOT EXISTS "{0}_au" AFTER UPDATE ON "{1}" BEGIN '
+        'INSERT INTO "{0}"("{0}", rowid, {2}) VALUES (\'delete\', old.id, {3}); '
+        'INSERT INTO "{0}"(rowid, {2}) VALUES (new.id, {4}); END'
+        .format(fts, table_name, columns, old_values, new_values),
+    ]
+
+
+def register(model):
+    """Create the search indexes whenever the model's table is created."""
+    table_name = model.__tablename__
+    for statement in _postgres_ddl(table_name):
+        event.listen(model.__table__, 'after_create',
+                     DDL(statement).execute_if(dialect='postgresql'))
+    for statement in _sqlite_ddl(table_name):
+        event.listen(model.__table__, 'after_create',
+                     DDL(statement).execute_if(dialect='sqlite'))
+
+
+def install(connection, model):
+    """Create (if missing) and rebuild the search indexes of an existing table."""
+    table_name = model.__tablename__
+    for index in model.__table__.indexes:
+        if index.name == 'ix_{}_name_lower'.format(table_name):
+            index.create(connection, checkfirst=True)
+    if connection.dialect.name == 'postgresql':
+        for statement in _postgres_ddl(table_name):
+            connection.execute(text(statement))
+    elif connection.dialect.name == 'sqlite':
+        for statement in _sqlite_ddl(table_name):
+            connection.execute(text(statement))
+        connection.execute(text('INSERT INTO "{0}_fts"("{0}_fts") VALUES (\'rebuild\')'
+                                .format(table_name)))
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _ilike(query, model, term):
+    return query.filter(model.name.ilike('%' + escape_like(term) + '%', escape='\\')) \
+        .order_by(model.name, model.id)
+
+
+def _postgres(query, model, term):
+    table_name = model.__tablename__
+    document = literal_column(_document(table_name))
+    tsvector = literal_column(_tsvector(table_name))
+    tsquery = func.plainto_tsquery(literal_column("'simple'::regconfig"), term)
+    rank = func.greatest(func.similarity(model.name, term), func.ts_rank(tsvector, tsquery))
+    return query.filter(or_(tsvector.op('@@')(tsquery),
+                            document.ilike('%' + escape_like(term) + '%', escape='\\'))) \
+        .order_by(rank.desc(), model.id)
+
+
+def _sqlite(query, model, term):
+    words = re.findall(r'\w+', term)
+    if not words:
+        return None
+    fts_name = model.__tablename__ + '_fts'
+    fts = table(fts_name, column('rowid'))
+    # every word is matched as a prefix, in any of the indexed columns
+    match = ' '.join('"{}"*'.format(word) for word in words)
+    return query.join(fts, fts.c.rowid == model.id) \
+        .filter(text('"{}" MATCH :match'.format(fts_name)).bindparams(match=match)) \
+        .order_by(text('bm25("{}")'.format(fts_name)), model.id)
+
+
+BACKENDS = {
+    'postgresql': _postgres,
+    'sqlite': _sqlite,
+    'ilike': _ilike,
+}
+
+
+def search(session, model, term, page=1, per_page=20, max_results=200, backend=None):
+    """Ranked search over name, city, state and genres.
+
+    Returns the ``(id, name, city, state)`` rows of the requested page and
+    the number of matches, counted up to ``max_results``.
+    """
+    term = term.strip()
+    backend = backend or session.connection().dialect.name
+    query = session.query(model.id, model.name, model.city, model.state)
+
+    if term:
+        query = BACKENDS.get(backend, _ilike)(query, model, term)
+        if query is None:
+            return [], 0
+    else:
+        query = query.order_by(model.name, model.id)
+
+    capped = query.limit(max_results)
+    count = session.query(func.count()).select_from(capped.subquery()).scalar()
+
+    offset = (max(page, 1) - 1) * per_page
+    if offset >= max_results:
+        return [], count
+    rows = query.limit(min(per_page, max_results - offset)).offset(offset).all()
+    return rows, count
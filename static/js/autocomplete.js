@@ -0,0 +1,45 @@
+// Type-ahead for the search boxes: <input data-autocomplete="venue|artist" list="...">
+// fills its <datalist> from /autocomplete, picking a suggestion opens its page.
+(function () {
+    const inputs = document.querySelectorAll('input[data-autocomplete]');
+    for (let i = 0; i < inputs.length; i++) {
+        const input = inputs[i];
+        const list = document.getElementById(input.getAttribute('list'));
+        let timer = null;
+        let urls = {};
+
+        input.addEventListener('input', function () {
+            const query = input.value.trim();
+            if (urls[input.value]) {
+                window.location = urls[input.value];
+                return;
+            }
+            clearTimeout(timer);
+            if (!query) {
+                list.innerHTML = '';
+                return;
+            }
+            timer = setTimeout(function () {
+                fetch(input.dataset['autocompleteUrl'] + '?type=' + input.dataset['autocomplete'] +
+                    '&q=' + encodeURIComponent(query))
+                    .then(function (response) {
+                        return response.json();
+                    })
+                    .then(function (data) {
+                        if (data.query !== input.value.trim()) {
+                            return;
+                        }
+                        urls = {};
+                        list.innerHTML = '';
+                        data.results.forEach(function (result) {
+                            const option = document.createElement('option');
+                            option.value = result.name;
+                            option.label = [result.city, result.state].filter(Boolean).join(', ');
+                            list.appendChild(option);
+                            urls[result.name] = result.url;
+                        });
+                    });
+            }, 100);
+        });
+    }
+})();
@@ -0,0 +1,76 @@
+// Searchable <select data-lookup-url> (artist and venue pickers of the show and album forms):
+// a search box above it fetches a page of matching names, "More..." fetches the next page.
+(function () {
+    const selects = document.querySelectorAll('select[data-lookup-url]');
+    for (let i = 0; i < selects.length; i++) {
+        const select = selects[i];
+        const box = document.createElement('input');
+        box.type = 'search';
+        box.className = select.className;
+        box.placeholder = 'Type a name or an ID';
+        box.autocomplete = 'off';
+        select.parentNode.insertBefore(box, select);
+
+        let timer = null;
+        let query = null;
+        let more = null;
+
+        function load(q, after) {
+            let url = select.dataset['lookupUrl'] + '?q=' + encodeURIComponent(q);
+            if (after) {
+                url += '&after=' + encodeURIComponent(after);
+            }
+            fetch(url)
+                .then(function (response) {
+                    return response.json();
+                })
+                .then(function (data) {
+                    if (q !== query) {
+                        return;
+                    }
+                    const selected = select.value;
+                    if (more) {
+                        more.remove();
+                        more = null;
+                    }
+                    if (!after) {
+                        // keep the current choice, drop the other results
+                        for (let j = select.options.length - 1; j >= 0; j--) {
+                            if (!select.options[j].selected) {
+                                select.remove(j);
+                            }
+                        }
+                    }
+                    data.results.forEach(function (result) {
+                        if (String(result.id) === selected) {
+                            return;
+                        }
+                        select.add(new Option(result.name + ' (#' + result.id + ')', result.id));
+                    });
+                    if (data.next) {
+                        more = new Option('More...', '');
+                        more.dataset['next'] = data.next;
+                        select.add(more);
+                    }
+                });
+        }
+
+        function search() {
+            query = box.value.trim();
+            load(query, null);
+        }
+
+        box.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(search, 150);
+        });
+        select.addEventListener('change', function () {
+            const option = select.options[select.selectedIndex];
+            if (option && option === more) {
+                select.selectedIndex = 0;
+                load(query, option.dataset['next']);
+            }
+        });
+        search();
+    }
+})();
@@ -0,0 +1,4 @@
+from views import main, albums, venues, artists, shows
+
+# blueprints registered by create_app()
+blueprints = (main.bp, albums.bp, venues.bp, artists.bp, shows.bp)
@@ -0,0 +1,205 @@
+# ----------------------------------------------------------------------------#
+# Albums and their songs.
+# ----------------------------------------------------------------------------#
+
+from datetime import timedelta
+from itertools import groupby
+
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+
+import counters
+from cache import conditional
+from extensions import db, response_cache
+from forms import AlbumForm, SongForm
+from helpers import touch, album_version, per_page_arg
+from models import Artist, Album, Songs
+from routing import replica
+
+bp = Blueprint('albums', __name__)
+
+
+@bp.route('/albums')
+@replica
+@response_cache.cached('albums', 'artist-names')
+def albums():
+    page = request.args.get('page', 1, type=int)
+    per_page = per_page_arg(current_app.config.get('ALBUM_ARTISTS_PER_PAGE', 0))
+
+    # every artist, the ones without albums with an empty list as before
+    query = db.session.query(Artist.id.label('artist_id'), Artist.name.label('artist_name'),
+                             Album.id.label('album_id'), Album.name.label('album_name'),
+                             Album.songs_count.label('num_songs'),
+                             Album.songs_seconds.label('duration')) \
+        .select_from(Artist) \
+        .outerjoin(Album, Album.artist_id == Artist.id)
+
+    if per_page > 0:
+        # paginate by artist, one extra artist is fetched to know if there is a next page
+        artists = db.session.query(Artist.id) \
+            .order_by(Artist.name, Artist.id) \
+            .limit(per_page + 1).offset((max(page, 1) - 1) * per_page) \
+            .subquery()
+        query = query.join(artists, artists.c.id == Artist.id)
+
+    rows = query.order_by(Artist.name, Artist.id, Album.name).all()
+
+    data = []
+    for (artist_id, artist_name), albums in groupby(rows, key=lambda row: (row.artist_id, row.artist_name)):
+        data.append({
+            'artist_id': artist_id,
+            'artist_name': artist_name,
+            'artist_albums': [{
+                'album_id': album.album_id,
+                'album_name': album.album_name,
+                'num_songs': album.num_songs,
+                'total_duration': timedelta(seconds=int(album.duration))
+            } for album in albums if album.album_id is not None]
+        })
+
+    has_next = False
+    if per_page > 0 and len(data) > per_page:
+        data = data[:per_page]
+        has_next = True
+
+    return render_template('pages/albums.html', albums=data,
+                           page=page if per_page > 0 else None,
+                           has_next=has_next)
+
+
+@bp.route('/album/<int:album_id>')
+@replica
+@conditional(album_version)
+@response_cache.cached('album:{album_id}')
+def show_album(album_id):
+    album = Album.query.filter_by(id=album_id).first()
+    return render_template('pages/show_album.html', album=album)
+
+
+@bp.route('/album/<int:album_id>/edit', methods=['GET'])
+def edit_album(album_id):
+    form = AlbumForm()
+    album = Album.query.filter_by(id=album_id).first()
+
+    form.album_name.data = album.name
+    form.album_description.data = album.description
+    form.album_launch_date.data = album.launch_date
+    form.artist.data = album.artist_id
+
+    return render_template('forms/edit_album.html', form=form, album=album)
+
+
+@bp.route('/album/<int:album_id>/edit', methods=['POST'])
+def edit_album_submission(album_id):
+    album = Album.query.filter_by(id=album_id).first()
+    form = AlbumForm()
+    if album and not form.artist.validate(form):
+        flash('Please pick the artist from the list.')
+        return redirect(url_for('albums.edit_album', album_id=album_id))
+
+    if album:
+        try:
+            album.name = request.form.get('album_name', '')
+            album.description = request.form.get('album_description', '')
+            album.launch_date = request.form.get('album_launch_date', '')
+            previous_artist_id = album.artist_id
+            album.artist_id = request.form.get('artist', '')
+            touch(Artist, [previous_artist_id, int(album.artist_id)])
+            db.session.commit()
+            response_cache.invalidate('album:{}'.format(album.id), 'albums',
+                                      'artist:{}'.format(previous_artist_id),
+                                      'artist:{}'.format(album.artist_id))
+            flash('Album ' + request.form.get('album_name', '') + ' details were successfully updated!')
+        except:
+            db.session.rollback()
+            flash('Album ' + request.form.get('album_name', '') + ' details could not be updated!')
+
+    return redirect(url_for('albums.show_album', album_id=album.id))
+
+
+@bp.route('/album/create', methods=['GET'])
+def create_album_form():
+    form = AlbumForm()
+    return render_template('forms/new_album.html', form=form)
+
+
+@bp.route('/album/create', methods=['POST'])
+def create_album_submission():
+    form = AlbumForm()
+    if not form.artist.validate(form):
+        flash('Please pick the artist from the list.')
+        return redirect(url_for('albums.create_album_form'))
+
+    form_data = request.form.to_dict()
+
+    try:
+        album = Album(name=form_data['album_name'],
+                      description=form_data['album_description'],
+                      launch_date=form_data['album_launch_date'],
+                      artist_id=form_data['artist'])
+        db.session.add(album)
+        touch(Artist, [int(album.artist_id)])
+        db.session.commit()
+        response_cache.invalidate('albums', 'artist:{}'.format(album.artist_id))
+        flash('Album ' + request.form['album_name'] + ' was successfully listed!')
+    except:
+        db.session.rollback()
+        flash('An error occurred. Album ' + form_data['album_name'] + ' could not be listed.')
+    finally:
+        db.session.close()
+
+    return redirect(url_for('main.index'))
+
+
+@bp.route('/song/create/<album_id>', methods=['GET'])
+def create_song_form(album_id):
+    form = SongForm()
+    album = Album.query.filter_by(id=album_id).first()
+    form.album.data = album
+
+    return render_template('forms/new_song.html', form=form)
+
+
+@bp.route('/song/create/<int:album_id>', methods=['POST'])
+def add_song(album_id):
+    album = Album.query.filter_by(id=album_id).first()
+    form_data = request.form.to_dict()
+    song = Songs(
+        name=form_data['song_name'],
+        duration=form_data['song_duration'],
+        album_id=album.id
+    )
+    try:
+        if album:
+            db.session.add(song)
+            db.session.flush()
+            counters.songs_changed(album.id, [song.id], 1)
+            db.session.commit()
+            response_cache.invalidate('album:{}'.format(album.id), 'albums')
+            flash('Song ' + song.name + ' was successfully added!')
+    except:
+        flash('Song ' + song.name + ' could not be added...!')
+        db.session.rollback()
+
+    # will not db.session.close() as I need album.id to redirect.
+    return redirect(url_for('albums.show_album', album_id=album.id))
+
+
+@bp.route('/song/remove/<int:song_id>', methods=['DELETE'])
+def remove_song(song_id):
+    song_id = request.get_json()['song']
+    song = Songs.query.filter_by(id=song_id).first()
+    try:
+        if song:
+            album_id = song.album_id
+            counters.songs_changed(album_id, [song.id], -1)
+            db.session.delete(song)
+            db.session.commit()
+            response_cache.invalidate('album:{}'.format(album_id), 'albums')
+    except:
+        db.session.rollback()
+    finally:
+        db.session.close()
+
+    # return jsonify and handle the redirect with javascript
+    # as the DELETE method has issues.
+    return jsonify("success", 200)
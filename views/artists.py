@@ -0,0 +1,191 @@
+# ----------------------------------------------------------------------------#
+# Artists.
+# ----------------------------------------------------------------------------#
+
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+
+import search
+from cache import conditional
+from extensions import db, response_cache, autocomplete
+from forms import ArtistForm
+from helpers import get_genres, touch, played_by, artist_version, show_limits, entity_shows
+from models import Genre, ArtistGenres, Venue, Artist, Shows
+from routing import replica
+
+bp = Blueprint('artists', __name__)
+
+
+@bp.route('/artists')
+@replica
+@response_cache.cached('artists')
+def artists():
+    artists = Artist.query.all()
+    return render_template('pages/artists.html', artists=artists)
+
+
+@bp.route('/artists/genres/<genre>')
+@replica
+def artists_by_genre(genre):
+    page = request.args.get('page', 1, type=int)
+    per_page = current_app.config.get('GENRE_LISTING_PER_PAGE', 50)
+
+    query = db.session.query(Artist.id, Artist.name, Artist.updated_at) \
+        .join(ArtistGenres, ArtistGenres.c.artist_id == Artist.id) \
+        .join(Genre, Genre.id == ArtistGenres.c.genre_id) \
+        .filter(Genre.name == genre)
+    if request.args.get('city'):
+        query = query.filter(Artist.city == request.args['city'])
+    if request.args.get('state'):
+        query = query.filter(Artist.state == request.args['state'])
+
+    rows = query.order_by(Artist.name, Artist.id) \
+        .limit(per_page + 1).offset((max(page, 1) - 1) * per_page).all()
+
+    args = request.args.to_dict()
+    args.pop('page', None)
+    return render_template('pages/artists.html', artists=rows[:per_page],
+                           prev_url=url_for('artists.artists_by_genre', genre=genre, page=page - 1, **args)
+                           if page > 1 else None,
+                           next_url=url_for('artists.artists_by_genre', genre=genre, page=page + 1, **args)
+                           if len(rows) > per_page else None)
+
+
+@bp.route('/artists/search', methods=['GET', 'POST'])
+@replica
+def search_artists():
+    search_term = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    per_page = current_app.config.get('SEARCH_PER_PAGE', 20)
+
+    results, count = search.search(db.session, Artist, search_term,
+                                   page=page, per_page=per_page,
+                                   max_results=current_app.config.get('SEARCH_MAX_RESULTS', 200),
+                                   backend=current_app.config.get('SEARCH_BACKEND'))
+
+    return render_template('pages/search_artists.html',
+                           results=results,
+                           count=count,
+                           page=page,
+                           has_next=page * per_page < count,
+                           search_term=search_term)
+
+
+@bp.route('/artists/<int:artist_id>')
+@replica
+@conditional(artist_version)
+@response_cache.cached('artist:{artist_id}', 'venue-names')
+def show_artist(artist_id):
+    limits = show_limits()
+
+    artist = Artist.query.get(artist_id)
+    if artist is None:
+        abort(404)
+
+    u_shows, p_shows = entity_shows(Shows.artist_id == artist.id, Venue, Shows.venue_id,
+                                    'venue', limits)
+
+    data = {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": True if artist.seeking_venue == 'y' else False,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+        "listed_on": artist.listed_on,
+        "albums": artist.album,
+        "past_shows": p_shows,
+        "upcoming_shows": u_shows,
+        "past_shows_count": artist.past_shows_count,
+        "upcoming_shows_count": artist.upcoming_shows_count,
+    }
+
+    return render_template('pages/show_artist.html', artist=data, limits=limits)
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    form = ArtistForm()
+    artist = Artist.query.filter_by(id=artist_id).first()
+
+    form.name.data = artist.name
+    form.city.data = artist.city
+    form.state.data = artist.state
+    form.phone.data = artist.phone
+    form.genres.data = [genre.name for genre in artist.genre_list]
+    form.facebook_link.data = artist.facebook_link
+    form.image_link.data = artist.image_link
+    form.website_link.data = artist.website_link
+    form.seeking_venue.data = artist.seeking_venue
+    form.seeking_description.data = artist.seeking_description
+
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    artist = Artist.query.filter_by(id=artist_id).first()
+
+    if artist:
+        try:
+            artist.name = request.form.get('name', '')
+            artist.city = request.form.get('city', '')
+            artist.state = request.form.get('state', '')
+            artist.genres = ','.join(request.form.getlist('genres'))
+            artist.genre_list = get_genres(request.form.getlist('genres'))
+            artist.facebook_link = request.form.get('facebook_link', '')
+            artist.image_link = request.form.get('image_link', '')
+            artist.website_link = request.form.get('website_link', '')
+            artist.seeking_venue = True if request.form.get('seeking_venue', '') == 'y' else False
+            artist.seeking_description = request.form.get('seeking_description', '')
+            touch(Venue, [id for id, in played_by(artist.id)])
+            entry = (artist.id, artist.name, artist.city, artist.state)
+            db.session.commit()
+            response_cache.invalidate('artist:{}'.format(artist_id), 'artists', 'artist-names')
+            autocomplete.put('artist', *entry)
+            flash('Artist ' + request.form.get('name', '') + ' details were successfully updated!')
+        except:
+            db.session.rollback()
+            flash('Artist ' + request.form.get('name', '') + ' details could not be updated!')
+        finally:
+            db.session.close()
+
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    form_data = request.form.to_dict()
+    genres = ','.join(request.form.getlist('genres'))
+    seeking_venue = True if request.form.get('seeking_talent') == 'y' else False
+
+    try:
+        artist = Artist(name=form_data['name'], city=form_data['city'], state=form_data['state'],
+                        phone=form_data['phone'], genres=genres, facebook_link=form_data['facebook_link'],
+                        image_link=form_data['image_link'], website_link=form_data['website_link'],
+                        seeking_venue=seeking_venue, seeking_description=form_data['seeking_description'])
+        artist.genre_list = get_genres(request.form.getlist('genres'))
+        db.session.add(artist)
+        db.session.flush()
+        entry = (artist.id, artist.name, artist.city, artist.state)
+        db.session.commit()
+        response_cache.invalidate('artists')
+        autocomplete.put('artist', *entry)
+        flash('Artist ' + request.form['name'] + ' was successfully created!')
+    except:
+        db.session.rollback()
+        flash('An error occurred. Artist ' + form_data['name'] + ' could not be created.')
+    finally:
+        db.session.close()
+
+    return redirect(url_for('main.index'))
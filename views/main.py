@@ -0,0 +1,128 @@
+# ----------------------------------------------------------------------------#
+# Home page, autocomplete, exports, cache statistics and error pages.
+# ----------------------------------------------------------------------------#
+
+from itertools import zip_longest
+
+from flask import Blueprint, Response, abort, current_app, jsonify, render_template, request, url_for
+from sqlalchemy import func, or_, tuple_
+
+import bulk
+import search
+from extensions import db, response_cache, autocomplete
+from helpers import encode_name_cursor, decode_name_cursor
+from models import Venue, Artist, BULK_MODELS
+from routing import replica
+
+bp = Blueprint('main', __name__)
+
+
+@bp.route('/')
+@replica
+@response_cache.cached('venues', 'artists')
+def index():
+    recent_venues = Venue.query.order_by('listed_on').limit(10).all()
+    recent_artists = Artist.query.order_by('listed_on').limit(10).all()
+
+    return render_template('pages/home.html', col_size=2,
+                           recent_venues=recent_venues,
+                           recent_artists=recent_artists)
+
+
+@bp.route('/autocomplete')
+@replica
+def autocomplete_names():
+    """Type-ahead suggestions: ?q=<prefix>&type=venue|artist|all&limit=10."""
+    query = request.args.get('q', '').strip()
+    kinds = ('venue', 'artist') if request.args.get('type', 'all') == 'all' else (request.args.get('type'),)
+    if any(kind not in ('venue', 'artist') for kind in kinds):
+        abort(400)
+    limit = request.args.get('limit', current_app.config.get('AUTOCOMPLETE_LIMIT', 10), type=int)
+
+    found, sources = [], set()
+    if query:
+        for kind in kinds:
+            source, entries = autocomplete.lookup(kind, query, limit)
+            sources.add(source)
+            endpoint = 'venues.show_venue' if kind == 'venue' else 'artists.show_artist'
+            for entry in entries:
+                entry.update(type=kind, url=url_for(endpoint, **{kind + '_id': entry['id']}))
+            found.append(entries)
+
+    if sources == {'index'}:
+        # the best of both kinds, by number of shows
+        results = sorted((entry for entries in found for entry in entries),
+                         key=lambda entry: (-entry['shows'], entry['name']))
+    else:
+        # ranked by relevance per kind only, take turns
+        results = [entry for group in zip_longest(*found) for entry in group if entry]
+    results = results[:limit]
+
+    response = jsonify({'query': query, 'source': 'sql' if 'sql' in sources else 'index', 'results': results})
+    # a few seconds are enough to spare the repeats while typing and deleting
+    response.cache_control.max_age = 10
+    return response
+
+
+@bp.route('/lookup/<any(venues, artists):entity>')
+@replica
+def lookup(entity):
+    """A page of (id, name) choices for the show and album forms: ?q=<name prefix or id>&after=<cursor>."""
+    model = Venue if entity == 'venues' else Artist
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+
+    rows = db.session.query(model.id, model.name).filter(model.name.isnot(None))
+    if query:
+        # lower() on both sides: the prefix LIKE can use ix_<table>_name_lower,
+        # which ILIKE can't
+        match = func.lower(model.name).like(search.escape_like(query.lower()) + '%', escape='\\')
+        rows = rows.filter(or_(match, model.id == int(query)) if query.isdecimal() else match)
+    after = decode_name_cursor(request.args.get('after'))
+    if after:
+        rows = rows.filter(tuple_(model.name, model.id) > tuple_(*after))
+    rows = rows.order_by(model.name, model.id).limit(limit + 1).all()
+
+    return jsonify({
+        'results': [{'id': row.id, 'name': row.name} for row in rows[:limit]],
+        'next': encode_name_cursor(rows[limit - 1].name, rows[limit - 1].id) if len(rows) > limit else None,
+    })
+
+
+@bp.route('/export/<any(shows, venues, artists):entity>.<any(csv, ndjson):fmt>')
+def export(entity, fmt):
+    token = current_app.config.get('EXPORT_TOKEN')
+    if token and request.headers.get('Authorization') != 'Bearer ' + token:
+        abort(401)
+
+    table = BULK_MODELS[entity].__table__
+    batch_size = current_app.config.get('BULK_BATCH_SIZE', 5000)
+    # the generator runs after the app context is gone
+    engine = db.engine
+
+    def generate():
+        # the connection is held for as long as the download runs,
+        # rows are fetched batch by batch from a server-side cursor
+        with engine.connect() as connection:
+            yield from bulk.encode_rows(table, bulk.iter_rows(connection, table, batch_size), fmt)
+
+    response = Response(generate(), mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(entity, fmt)
+    # ask proxies to pass the rows on as they come
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@bp.route('/cache/stats')
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
@@ -0,0 +1,230 @@
+# ----------------------------------------------------------------------------#
+# Shows.
+# ----------------------------------------------------------------------------#
+
+from collections import Counter
+from datetime import datetime
+
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from sqlalchemy import or_, tuple_
+from sqlalchemy.exc import IntegrityError
+
+import booking
+import counters
+from extensions import db, response_cache, autocomplete
+from forms import ShowForm
+from helpers import encode_cursor, decode_cursor, show_conflict, per_page_arg
+from models import Venue, Artist, Shows
+from routing import replica
+
+bp = Blueprint('shows', __name__)
+
+
+@bp.route('/shows')
+@replica
+@response_cache.cached('shows', 'venue-names', 'artist-names')
+def shows():
+    per_page = per_page_arg(current_app.config.get('SHOWS_PER_PAGE', 30))
+    when = request.args.get('when', '')
+    venue_id = request.args.get('venue_id', type=int)
+    artist_id = request.args.get('artist_id', type=int)
+    date_from = request.args.get('from', '')
+    date_to = request.args.get('to', '')
+    cursor = decode_cursor(request.args.get('after', ''))
+    now = datetime.now()
+
+    # one joined statement with only the columns the template needs
+    query = db.session.query(Shows.show_id, Shows.start_time, Shows.updated_at,
+                             Venue.id.label('venue_id'), Venue.name.label('venue_name'),
+                             Venue.updated_at.label('venue_updated_at'),
+                             Artist.id.label('artist_id'), Artist.name.label('artist_name'),
+                             Artist.image_link.label('artist_image_link'),
+                             Artist.updated_at.label('artist_updated_at')) \
+        .join(Venue, Venue.id == Shows.venue_id) \
+        .join(Artist, Artist.id == Shows.artist_id)
+
+    if when == 'upcoming':
+        query = query.filter(Shows.start_time > now)
+    elif when == 'past':
+        query = query.filter(Shows.start_time <= now)
+    if venue_id:
+        query = query.filter(Shows.venue_id == venue_id)
+    if artist_id:
+        query = query.filter(Shows.artist_id == artist_id)
+    try:
+        if date_from:
+            query = query.filter(Shows.start_time >= datetime.fromisoformat(date_from))
+        if date_to:
+            query = query.filter(Shows.start_time <= datetime.fromisoformat(date_to))
+    except ValueError:
+        flash('Invalid date range, showing every date instead.')
+
+    # past shows are listed from the most recent one backwards
+    key = tuple_(Shows.start_time, Shows.show_id)
+    if when == 'past':
+        if cursor:
+            query = query.filter(key < cursor)
+        query = query.order_by(Shows.start_time.desc(), Shows.show_id.desc())
+    else:
+        if cursor:
+            query = query.filter(key > cursor)
+        query = query.order_by(Shows.start_time, Shows.show_id)
+
+    rows = query.limit(per_page + 1).all()
+    data = [{
+        "show_id": row.show_id,
+        "version": (row.updated_at, row.venue_updated_at, row.artist_updated_at),
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time
+    } for row in rows[:per_page]]
+
+    next_url = None
+    if len(rows) > per_page:
+        last = rows[per_page - 1]
+        args = request.args.to_dict()
+        args['after'] = encode_cursor(last.start_time, last.show_id)
+        next_url = url_for('shows.shows', **args)
+
+    return render_template('pages/shows.html', shows=data, next_url=next_url)
+
+
+@bp.route('/shows/create')
+def create_shows():
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    form = ShowForm()
+    if not (form.artist_id.validate(form) and form.venue_id.validate(form)):
+        flash('Please pick the artist and the venue from the lists.')
+        return redirect(url_for('shows.create_shows'))
+
+    form_data = request.form.to_dict()
+    start_time = datetime.strptime(form_data['start_time'], '%Y-%m-%d %H:%M:%S')
+    booked = ('The artist or the venue is already booked around that date!\n'
+              'Please choose a date before "{}" or\n'
+              'after "{}"'.format(start_time - booking.SHOW_SLOT,
+                                  start_time + booking.SHOW_SLOT))
+
+    if show_conflict(form_data['artist_id'], form_data['venue_id'], start_time):
+        flash(booked)
+        return redirect(url_for('shows.create_shows'))
+
+    try:
+        show = Shows(artist_id=form_data['artist_id'],
+                     venue_id=form_data['venue_id'],
+                     start_time=start_time,
+                     is_past=start_time <= datetime.now())
+        db.session.add(show)
+        counters.shows_added([(int(show.venue_id), int(show.artist_id), show.is_past)])
+        db.session.commit()
+        response_cache.invalidate('shows', 'venues',
+                                  'venue:{}'.format(show.venue_id), 'artist:{}'.format(show.artist_id))
+        autocomplete.bump('venue', int(show.venue_id))
+        autocomplete.bump('artist', int(show.artist_id))
+        flash('A new Show has been successfully listed!')
+    except IntegrityError:
+        # a concurrent booking took the slot after the check above
+        db.session.rollback()
+        flash(booked)
+        return redirect(url_for('shows.create_shows'))
+    except:
+        db.session.rollback()
+        flash('An error occurred. Show could not be listed.')
+    finally:
+        db.session.close()
+
+    return redirect(url_for('main.index'))
+
+
+@bp.route('/shows/batch', methods=['POST'])
+def create_shows_batch():
+    """Book a whole tour: {"shows": [{"artist_id", "venue_id", "start_time"}, ...]}.
+
+    Every row is checked in one pass, against the other rows and the stored
+    shows, the valid rows are inserted in a single transaction and the
+    response reports the outcome of each row.
+    """
+    payload = request.get_json(silent=True)
+    items = payload.get('shows') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'expected a non-empty "shows" list'}), 400
+    if len(items) > current_app.config.get('SHOW_BATCH_MAX', 500):
+        return jsonify({'error': 'at most {} shows per batch'.format(current_app.config.get('SHOW_BATCH_MAX', 500))}), 400
+
+    report = [{'row': row, 'status': 'invalid'} for row in range(len(items))]
+    rows = []
+    for row, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise TypeError(item)
+            start_time = datetime.fromisoformat(str(item['start_time']))
+            if start_time.tzinfo is not None:
+                # the shows are stored in naive local time, an offset cannot be compared to them
+                raise ValueError(start_time)
+            rows.append((row, int(item['artist_id']), int(item['venue_id']), start_time))
+        except (KeyError, TypeError, ValueError):
+            report[row]['reason'] = 'artist_id, venue_id and an ISO start_time without offset are required'
+
+    artist_ids = {artist_id for _, artist_id, _, _ in rows}
+    venue_ids = {venue_id for _, _, venue_id, _ in rows}
+    known_artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+    known_venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+    for row, artist_id, venue_id, _ in rows:
+        if artist_id not in known_artists or venue_id not in known_venues:
+            report[row]['reason'] = 'unknown artist or venue'
+    rows = [item for item in rows if 'reason' not in report[item[0]]]
+
+    existing = []
+    if rows:
+        existing = db.session.query(Shows.artist_id, Shows.venue_id, Shows.start_time) \
+            .filter(or_(Shows.artist_id.in_(artist_ids), Shows.venue_id.in_(venue_ids))) \
+            .filter(Shows.start_time > min(item[3] for item in rows) - booking.SHOW_SLOT) \
+            .filter(Shows.start_time < max(item[3] for item in rows) + booking.SHOW_SLOT) \
+            .all()
+
+    shows = []
+    now = datetime.now()
+    for (row, artist_id, venue_id, start_time), reason in zip(rows, booking.plan(rows, existing)):
+        if reason:
+            report[row].update(status='conflict', reason=reason)
+        else:
+            shows.append((row, {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time,
+                                'is_past': start_time <= now}))
+
+    try:
+        if shows:
+            # one executemany, then one lookup for the ids: an artist has at
+            # most one show starting at a given time
+            db.session.execute(Shows.__table__.insert(), [show for _, show in shows])
+            ids = {(artist_id, start_time): show_id for artist_id, start_time, show_id in
+                   db.session.query(Shows.artist_id, Shows.start_time, Shows.show_id)
+                   .filter(tuple_(Shows.artist_id, Shows.start_time)
+                           .in_([(show['artist_id'], show['start_time']) for _, show in shows]))}
+            counters.shows_added([(show['venue_id'], show['artist_id'], show['is_past']) for _, show in shows])
+        db.session.commit()
+        response_cache.invalidate('shows', 'venues',
+                                  *{'venue:{}'.format(show['venue_id']) for _, show in shows},
+                                  *{'artist:{}'.format(show['artist_id']) for _, show in shows})
+        for venue_id, count in Counter(show['venue_id'] for _, show in shows).items():
+            autocomplete.bump('venue', venue_id, count)
+        for artist_id, count in Counter(show['artist_id'] for _, show in shows).items():
+            autocomplete.bump('artist', artist_id, count)
+        for row, show in shows:
+            report[row].update(status='created', show_id=ids[show['artist_id'], show['start_time']])
+    except IntegrityError:
+        # a concurrent booking took one of the slots, nothing was stored
+        db.session.rollback()
+        for row, _ in shows:
+            report[row].update(status='retry', reason='a concurrent booking conflicts with this batch')
+        return jsonify({'created': 0, 'shows': report}), 409
+    finally:
+        db.session.close()
+
+    return jsonify({'created': len(shows), 'shows': report})
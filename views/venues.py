@@ -0,0 +1,283 @@
+# ----------------------------------------------------------------------------#
+# Venues.
+# ----------------------------------------------------------------------------#
+
+from collections import Counter
+from itertools import groupby
+
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request, url_for
+from sqlalchemy import and_
+from sqlalchemy.exc import SQLAlchemyError
+
+import counters
+import search
+from cache import conditional
+from extensions import db, response_cache, autocomplete
+from forms import VenueForm
+from helpers import get_genres, touch, played_at, venue_version, show_limits, entity_shows, per_page_arg
+from models import Genre, VenueGenres, Venue, Artist, Shows
+from routing import replica
+
+bp = Blueprint('venues', __name__)
+
+
+@bp.route('/venues')
+@replica
+@response_cache.cached('venues', 'shows')
+def venues():
+    page = request.args.get('page', 1, type=int)
+    per_page = per_page_arg(current_app.config.get('VENUE_AREAS_PER_PAGE', 0))
+
+    # the upcoming show count is a column of the row, kept by counters.py
+    query = db.session.query(Venue.city, Venue.state, Venue.id, Venue.name, Venue.updated_at,
+                             Venue.upcoming_shows_count.label('num_upcoming_shows'))
+
+    has_next = False
+    if per_page > 0:
+        # paginate by area, one extra area is fetched to know if there is a next page
+        areas = db.session.query(Venue.city, Venue.state) \
+            .distinct() \
+            .order_by(Venue.state, Venue.city) \
+            .limit(per_page + 1).offset((max(page, 1) - 1) * per_page) \
+            .subquery()
+        query = query.join(areas, and_(Venue.city == areas.c.city, Venue.state == areas.c.state))
+
+    rows = query.order_by(Venue.state, Venue.city, Venue.name).all()
+
+    data = []
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+        data.append({
+            'city': city,
+            'state': state,
+            'venues': [{
+                'id': venue.id,
+                'name': venue.name,
+                'updated_at': venue.updated_at,
+                'num_upcoming_shows': venue.num_upcoming_shows
+            } for venue in venues]
+        })
+
+    if per_page > 0 and len(data) > per_page:
+        data = data[:per_page]
+        has_next = True
+
+    return render_template('pages/venues.html', areas=data,
+                           prev_url=url_for('venues.venues', page=page - 1) if per_page > 0 and page > 1 else None,
+                           next_url=url_for('venues.venues', page=page + 1) if has_next else None)
+
+
+@bp.route('/venues/genres/<genre>')
+@replica
+def venues_by_genre(genre):
+    page = request.args.get('page', 1, type=int)
+    per_page = current_app.config.get('GENRE_LISTING_PER_PAGE', 50)
+
+    query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.updated_at) \
+        .join(VenueGenres, VenueGenres.c.venue_id == Venue.id) \
+        .join(Genre, Genre.id == VenueGenres.c.genre_id) \
+        .filter(Genre.name == genre)
+    if request.args.get('city'):
+        query = query.filter(Venue.city == request.args['city'])
+    if request.args.get('state'):
+        query = query.filter(Venue.state == request.args['state'])
+
+    rows = query.order_by(Venue.state, Venue.city, Venue.name, Venue.id) \
+        .limit(per_page + 1).offset((max(page, 1) - 1) * per_page).all()
+
+    data = []
+    for (city, state), venues in groupby(rows[:per_page], key=lambda row: (row.city, row.state)):
+        data.append({
+            'city': city,
+            'state': state,
+            'venues': [{'id': venue.id, 'name': venue.name, 'updated_at': venue.updated_at}
+                       for venue in venues]
+        })
+
+    args = request.args.to_dict()
+    args.pop('page', None)
+    return render_template('pages/venues.html', areas=data,
+                           prev_url=url_for('venues.venues_by_genre', genre=genre, page=page - 1, **args)
+                           if page > 1 else None,
+                           next_url=url_for('venues.venues_by_genre', genre=genre, page=page + 1, **args)
+                           if len(rows) > per_page else None)
+
+
+@bp.route('/venues/search', methods=['GET', 'POST'])
+@replica
+def search_venues():
+    search_term = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    per_page = current_app.config.get('SEARCH_PER_PAGE', 20)
+
+    results, count = search.search(db.session, Venue, search_term,
+                                   page=page, per_page=per_page,
+                                   max_results=current_app.config.get('SEARCH_MAX_RESULTS', 200),
+                                   backend=current_app.config.get('SEARCH_BACKEND'))
+
+    return render_template('pages/search_venues.html',
+                           results=results,
+                           count=count,
+                           page=page,
+                           has_next=page * per_page < count,
+                           search_term=search_term)
+
+
+@bp.route('/venues/<int:venue_id>')
+@replica
+@conditional(venue_version)
+@response_cache.cached('venue:{venue_id}', 'artist-names')
+def show_venue(venue_id):
+    limits = show_limits()
+
+    venue = Venue.query.get(venue_id)
+    if venue is None:
+        abort(404)
+
+    u_shows, p_shows = entity_shows(Shows.venue_id == venue.id, Artist, Shows.artist_id,
+                                    'artist', limits)
+
+    data = {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres,
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website_link,
+        "facebook_link": venue.facebook_link,
+        "listed_on": venue.listed_on,
+        "seeking_talent": True if venue.seeking_talent == 'y' else False,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "past_shows": p_shows,
+        "upcoming_shows": u_shows,
+        "past_shows_count": venue.past_shows_count,
+        "upcoming_shows_count": venue.upcoming_shows_count,
+    }
+
+    return render_template('pages/show_venue.html', venue=data, limits=limits)
+
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    form_data = request.form.to_dict()
+
+    genres = ','.join(request.form.getlist('genres'))
+    seeking_talent = True if request.form.get('seeking_talent') == 'y' else False
+
+    try:
+        venue = Venue(name=form_data['name'], city=form_data['city'], state=form_data['state'],
+                      address=form_data['address'],
+                      phone=form_data['phone'], genres=genres, facebook_link=form_data['facebook_link'],
+                      image_link=form_data['image_link'], website_link=form_data['website_link'],
+                      seeking_talent=seeking_talent, seeking_description=form_data['seeking_description'])
+        venue.genre_list = get_genres(request.form.getlist('genres'))
+        db.session.add(venue)
+        db.session.flush()
+        entry = (venue.id, venue.name, venue.city, venue.state)
+        db.session.commit()
+        response_cache.invalidate('venues')
+        autocomplete.put('venue', *entry)
+        flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    except:
+        db.session.rollback()
+        flash('An error occurred. Venue ' + form_data['name'] + ' could not be listed.')
+    finally:
+        db.session.close()
+
+    return redirect(url_for('main.index'))
+
+
+@bp.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    venue_id = request.get_json()['venue']
+    venue = Venue.query.filter_by(id=venue_id).first()
+    if venue is None:
+        return jsonify("success", 200)
+    name = venue.name
+
+    try:
+        # locked, so that counters.roll() cannot flag them in between
+        shows = db.session.query(Shows.venue_id, Shows.artist_id, Shows.is_past) \
+            .filter(Shows.venue_id == venue.id).with_for_update().all()
+        artist_ids = [artist_id for _, artist_id, _ in shows]
+        counters.shows_removed(shows)
+        # deleted here: through the Venue.artists secondary, an artist with
+        # several shows at the venue is one row expected to match many
+        Shows.query.filter_by(venue_id=venue.id).delete(synchronize_session=False)
+        db.session.expire(venue, ['artists'])
+        db.session.delete(venue)
+        db.session.commit()
+        response_cache.invalidate('venue:{}'.format(venue_id), 'venues', 'venue-names', 'shows')
+        autocomplete.remove('venue', venue_id)
+        for artist_id, count in Counter(artist_ids).items():
+            autocomplete.bump('artist', artist_id, -count)
+        flash('Venue ' + name + ' was successfully removed!')
+    except SQLAlchemyError:
+        db.session.rollback()
+        flash('Venue ' + name + ' could not be deleted...!')
+    finally:
+        db.session.close()
+
+    # return redirect(url_for('index)) does not work here
+    # so it's implemented in JS
+    return jsonify("success", 200)
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    form = VenueForm()
+    venue = Venue.query.filter_by(id=venue_id).first()
+
+    form.name.data = venue.name
+    form.city.data = venue.city
+    form.state.data = venue.state
+    form.address.data = venue.address
+    form.phone.data = venue.phone
+    form.genres.data = [genre.name for genre in venue.genre_list]
+    form.facebook_link.data = venue.facebook_link
+    form.image_link.data = venue.image_link
+    form.website_link.data = venue.website_link
+    form.seeking_talent.data = venue.seeking_talent
+    form.seeking_description.data = venue.seeking_description
+
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    venue = Venue.query.filter_by(id=venue_id).first()
+
+    if venue:
+        try:
+            venue.name = request.form.get('name', '')
+            venue.city = request.form.get('city', '')
+            venue.state = request.form.get('state', '')
+            venue.address = request.form.get('address', '')
+            venue.genres = ','.join(request.form.getlist('genres'))
+            venue.genre_list = get_genres(request.form.getlist('genres'))
+            venue.facebook_link = request.form.get('facebook_link', '')
+            venue.image_link = request.form.get('image_link', '')
+            venue.website_link = request.form.get('website_link', '')
+            venue.seeking_venue = True if request.form.get('seeking_venue', '') == 'y' else False
+            venue.seeking_description = request.form.get('seeking_description', '')
+            touch(Artist, [id for id, in played_at(venue.id)])
+            entry = (venue.id, venue.name, venue.city, venue.state)
+            db.session.commit()
+            response_cache.invalidate('venue:{}'.format(venue_id), 'venues', 'venue-names')
+            autocomplete.put('venue', *entry)
+            flash('Venue ' + request.form.get('name', '') + ' details were successfully updated!')
+        except:
+            db.session.rollback()
+            flash('Venue ' + request.form.get('name', '') + ' details could not be updated!')
+        finally:
+            db.session.close()
+
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))